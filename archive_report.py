@@ -0,0 +1,42 @@
+import os
+import time
+
+from configparser import ConfigParser
+from argparse import ArgumentParser
+
+from crawler.analytics import format_report
+from crawler.archive_analytics import analyze_archive
+
+
+def main(config_file, archive_dir, processes, top, output):
+    if not archive_dir:
+        cparser = ConfigParser()
+        cparser.read(config_file)
+        archive_dir = cparser["LOCAL PROPERTIES"].get("ARCHIVE", "")
+        if not archive_dir:
+            raise SystemExit(
+                f"ARCHIVE is not set in {config_file}; pass --archive.")
+    start = time.perf_counter()
+    report = format_report(*analyze_archive(archive_dir, processes), top)
+    elapsed = time.perf_counter() - start
+    if not output:
+        print(report, end="")
+        return
+    with open(output, "w") as report_file:
+        report_file.write(report)
+    print(f"Wrote the report of {archive_dir} to {output} in {elapsed:.1f}s "
+          f"with {processes} processes.")
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser(
+        description="Compute the crawl report from the archived pages, "
+                    "in parallel, without downloading anything.")
+    parser.add_argument("--config_file", type=str, default="config.ini")
+    parser.add_argument("--archive", type=str, default=None)
+    parser.add_argument("--processes", type=int, default=os.cpu_count())
+    parser.add_argument("--top", type=int, default=50)
+    parser.add_argument("--output", type=str, default=None)
+    args = parser.parse_args()
+    main(args.config_file, args.archive, args.processes, args.top,
+         args.output)
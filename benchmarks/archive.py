@@ -0,0 +1,69 @@
+import os
+import time
+import random
+import tempfile
+
+from argparse import ArgumentParser
+
+from scraper import extract_next_links
+from crawler.archive import ArchiveWriter, ArchiveReader
+from benchmarks.corpus import DEFAULT_CORPUS, load_corpus, decode_pages
+
+
+def main(paths, count, segment_size):
+    responses = decode_pages(load_corpus(paths))
+    # Distinct urls, so every page gets its own index entry.
+    pages = [
+        (f"{url}/archived/{number}", resp)
+        for number in range(count // len(responses) + 1)
+        for url, resp in responses][:count]
+    body_bytes = sum(len(resp.raw_response.content) for _, resp in pages)
+    # What a worker already spends on a page, for comparison.
+    start = time.perf_counter()
+    for url, resp in responses:
+        extract_next_links(url, resp)
+    parse_time = (time.perf_counter() - start) / len(responses)
+    with tempfile.TemporaryDirectory() as tmp:
+        directory = os.path.join(tmp, "archive")
+        writer = ArchiveWriter(directory, True, segment_size)
+        start = time.perf_counter()
+        for url, resp in pages:
+            writer.write(url, resp)
+        writer.close()
+        write_time = time.perf_counter() - start
+        archive_bytes = sum(
+            os.path.getsize(os.path.join(directory, name))
+            for name in os.listdir(directory))
+        segments = len(os.listdir(directory)) - 1
+
+        reader = ArchiveReader(directory)
+        start = time.perf_counter()
+        scanned = sum(1 for _ in reader)
+        scan_time = time.perf_counter() - start
+        sample = random.Random(0).sample(pages, min(1000, len(pages)))
+        start = time.perf_counter()
+        for url, resp in sample:
+            assert reader.get(url)[3] == resp.raw_response.content
+        get_time = (time.perf_counter() - start) / len(sample)
+        reader.close()
+    assert scanned == len(pages)
+    print(f"{'pages':<24}{len(pages)} in {segments} segments")
+    print(f"{'write_us_per_page':<24}{write_time / len(pages) * 1e6:.0f}")
+    print(f"{'parse_us_per_page':<24}{parse_time * 1e6:.0f}")
+    print(f"{'write_mb_per_s':<24}{body_bytes / write_time / 1e6:.1f}")
+    print(f"{'compression_ratio':<24}{body_bytes / archive_bytes:.2f}")
+    print(f"{'scan_pages_per_s':<24}{scanned / scan_time:.0f}")
+    print(f"{'get_us_per_page':<24}{get_time * 1e6:.0f}")
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser(
+        description="Measure the page archive: write cost per page against "
+                    "parsing, compression, scans and random reads.")
+    parser.add_argument("corpus", nargs="*", default=DEFAULT_CORPUS)
+    parser.add_argument("--pages", type=int, default=5000)
+    parser.add_argument(
+        "--segment_size", type=int, default=1 << 24,
+        help="Smaller than the crawler's default, to exercise rotation.")
+    args = parser.parse_args()
+    main(args.corpus, args.pages, args.segment_size)
@@ -0,0 +1,91 @@
+import time
+
+from argparse import ArgumentParser
+from hashlib import sha256
+from urllib.parse import urlparse, urljoin
+
+from scraper import extract_next_links, filter_urls
+from utils import normalize, get_urlhash
+from utils.canonical import canonicalize
+from utils.text import parse_page
+from benchmarks.corpus import DEFAULT_CORPUS, load_corpus, decode_pages
+
+
+# normalize and get_urlhash as they were before utils/canonical.py, to count
+# the urls they told apart that are the same page.
+def reference_normalize(url):
+    if url.endswith("/"):
+        return url.rstrip("/")
+    return url
+
+def reference_urlhash(url):
+    parsed = urlparse(url)
+    return sha256(
+        f"{parsed.netloc}/{parsed.path}/{parsed.params}/"
+        f"{parsed.query}/{parsed.fragment}".encode("utf-8")).hexdigest()
+
+
+def distinct(urls, normalize, urlhash):
+    return len({urlhash(normalize(url)) for url in urls})
+
+
+def timed(function, urls, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for url in urls:
+            function(url)
+        best = min(best, time.perf_counter() - start)
+    return len(urls) / best
+
+
+def main(paths, repeat):
+    pages = decode_pages(load_corpus(paths))
+    links = list()
+    aliases = 0
+    fetched = {reference_urlhash(reference_normalize(url)) for url, _ in pages}
+    for url, resp in pages:
+        links.extend(filter_urls(extract_next_links(url, resp)))
+        page = parse_page(resp)
+        canonical = page.canonical if page is not None else None
+        if canonical:
+            canonical = urljoin(resp.url or url, canonical)
+            if get_urlhash(canonical) != get_urlhash(url):
+                aliases += 1
+    before = distinct(links, reference_normalize, reference_urlhash)
+    after = distinct(links, normalize, get_urlhash)
+    fetched_after = distinct(
+        [url for url, _ in pages], normalize, get_urlhash)
+    print(f"{'pages':<26}{len(pages)}")
+    print(f"{'valid_links':<26}{len(links)}")
+    print(f"{'distinct_before':<26}{before}")
+    print(f"{'distinct_after':<26}{after}")
+    print(f"{'fetches_avoided':<26}{before - after} "
+          f"({(before - after) / max(before, 1):.1%} of the discovered urls)")
+    print(f"{'recorded_duplicates':<26}{len(fetched) - fetched_after} "
+          f"of {len(fetched)} recorded pages")
+    print(f"{'rel_canonical_aliases':<26}{aliases}")
+
+    urls = list(dict.fromkeys(links))
+    reference = timed(
+        lambda url: reference_urlhash(reference_normalize(url)), urls, repeat)
+    def uncached(url):
+        canonicalize.cache_clear()
+        return get_urlhash(normalize(url))
+    cold = timed(uncached, urls, repeat)
+    cached = timed(lambda url: get_urlhash(normalize(url)), urls, repeat)
+    print(f"{'reference_urls_per_s':<26}{reference:.0f}")
+    print(f"{'uncached_urls_per_s':<26}{cold:.0f}")
+    print(f"{'cached_urls_per_s':<26}{cached:.0f}")
+    print(f"{'cache':<26}{canonicalize.cache_info()}")
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser(
+        description="Count the urls of a corpus or recorded crawl that "
+                    "canonicalization finds to be the same page, and "
+                    "compare the cost of normalize and get_urlhash.")
+    parser.add_argument("corpus", nargs="*", default=DEFAULT_CORPUS)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    main(args.corpus, args.repeat)
@@ -0,0 +1,46 @@
+import os
+import cbor
+import pickle
+import requests
+
+from utils.response import Response
+from utils.cache_replay import read_recording
+
+# Url that html files in the corpus are treated as having been fetched from.
+DEFAULT_BASE_URL = "https://www.ics.uci.edu/"
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_CORPUS = [os.path.join(ROOT, "ics.html")]
+
+
+def encode_page(url, html, content_type="text/html; charset=UTF-8"):
+    ''' The cbor body the cache server would send for a saved page. '''
+    raw_response = requests.Response()
+    raw_response.status_code = 200
+    raw_response.url = url
+    raw_response.headers["Content-Type"] = content_type
+    raw_response._content = html
+    return cbor.dumps({
+        "url": url, "status": 200, "response": pickle.dumps(raw_response)})
+
+
+def load_corpus(paths, base_url=DEFAULT_BASE_URL):
+    ''' Returns [(url, cbor body)] for every page in the given paths.
+
+    A path is either an html file, treated as fetched from base_url, or a
+    recording made with launch.py --record, of which every successful
+    response is used. '''
+    pages = list()
+    for path in paths:
+        if path.endswith((".html", ".htm")):
+            with open(path, "rb") as html_file:
+                pages.append((base_url, encode_page(base_url, html_file.read())))
+        else:
+            for url, (status, body) in read_recording(path).items():
+                if status == 200 and body:
+                    pages.append((url, body))
+    return pages
+
+
+def decode_pages(pages):
+    ''' The Response objects download() would return for the pages. '''
+    return [(url, Response(cbor.loads(body))) for url, body in pages]
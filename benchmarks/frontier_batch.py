@@ -0,0 +1,86 @@
+import os
+import time
+import tempfile
+
+from argparse import ArgumentParser
+from configparser import ConfigParser
+
+from utils.config import Config
+from utils.canonical import canonicalize
+from crawler.frontier import Frontier, LogFrontier
+
+
+def synthetic_pages(pages, links):
+    ''' Every page links to the same navigation urls and to new ones, some
+    of them twice, like a real site's pages do. '''
+    hosts = ["www.ics.uci.edu", "www.cs.uci.edu", "www.stat.uci.edu"]
+    navigation = [
+        f"https://{hosts[number % len(hosts)]}/about/section-{number}/"
+        for number in range(links // 2)]
+    for page in range(pages):
+        url = f"https://www.ics.uci.edu/people/person-{page}"
+        found = [
+            f"https://{hosts[number % len(hosts)]}/people/person-{page}/"
+            f"papers/paper-{number % (links // 4)}"
+            for number in range(links - len(navigation))]
+        yield url, navigation + found
+
+
+def make_config(tmp, store):
+    parser = ConfigParser()
+    parser.read("config.ini")
+    local = parser["LOCAL PROPERTIES"]
+    local["SAVE"] = os.path.join(tmp, f"frontier-{store}")
+    local["STORE"] = store
+    local["ARCHIVE"] = ""
+    parser["CRAWLER"]["ROBOTSCACHE"] = os.path.join(tmp, "robots.shelve")
+    parser["CRAWLER"]["TRAPBUDGET"] = "0"
+    parser["CRAWLER"]["TRAPMINPAGES"] = "0"
+    return Config(parser)
+
+
+def per_url(frontier, url, links):
+    for link in links:
+        frontier.add_url(link, url)
+    frontier.mark_url_complete(url)
+
+
+def batched(frontier, url, links):
+    frontier.complete_and_add(url, links)
+
+
+def run(store, add, pages, links):
+    canonicalize.cache_clear()
+    with tempfile.TemporaryDirectory() as tmp:
+        config = make_config(tmp, store)
+        frontier = (LogFrontier if store == "log" else Frontier)(config, True)
+        # Every page is in the seen set, as if it had been added earlier.
+        frontier.add_urls(url for url, _ in synthetic_pages(pages, links))
+        start = time.perf_counter()
+        for url, found in synthetic_pages(pages, links):
+            add(frontier, url, found)
+        frontier.save.sync()
+        elapsed = time.perf_counter() - start
+        pending = frontier.queued_count
+        frontier.close()
+    return pages / elapsed, pending
+
+
+def main(pages, links):
+    for store in ("shelve", "log"):
+        before, pending_before = run(store, per_url, pages, links)
+        after, pending_after = run(store, batched, pages, links)
+        assert pending_before == pending_after
+        print(f"{store + '_pages_per_s':<24}{before:.0f} per url, "
+              f"{after:.0f} batched ({after / before:.1f}x), "
+              f"{pending_after} urls added")
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser(
+        description="Compare adding the links of each page one url at a "
+                    "time with Frontier.complete_and_add.")
+    parser.add_argument("--pages", type=int, default=50)
+    parser.add_argument("--links", type=int, default=200)
+    args = parser.parse_args()
+    main(args.pages, args.links)
@@ -0,0 +1,105 @@
+import os
+import time
+import random
+import tempfile
+import itertools
+
+from argparse import ArgumentParser
+
+from crawler.simhash import SimHashIndex, simhash
+
+
+def make_pages(count, words, template_words, duplicate_rate, edit_rate,
+               vocabulary, seed):
+    ''' Yields (tokens, original) for count synthetic pages. Every page
+    starts with the same template_words words, like a site's navigation,
+    followed by its own words drawn from a Zipf-like vocabulary. A
+    duplicate_rate of the pages are copies of an earlier page with edit_rate
+    of their own words replaced; original is then the index of that page,
+    otherwise None. '''
+    rng = random.Random(seed)
+    vocabulary = [f"w{rank}" for rank in range(vocabulary)]
+    weights = list(itertools.accumulate(
+        1 / (rank + 1) for rank in range(len(vocabulary))))
+    template = rng.choices(vocabulary, cum_weights=weights, k=template_words)
+    content_words = words - template_words
+    originals = list()
+    for _ in range(count):
+        if originals and rng.random() < duplicate_rate:
+            original = rng.randrange(len(originals))
+            content = list(originals[original])
+            for position in rng.sample(
+                    range(content_words),
+                    max(1, int(content_words * edit_rate))):
+                content[position] = rng.choices(
+                    vocabulary, cum_weights=weights)[0]
+            yield template + content, original
+        else:
+            content = rng.choices(
+                vocabulary, cum_weights=weights, k=content_words)
+            originals.append(content)
+            yield template + content, None
+
+
+def main(count, words, template_words, duplicate_rate, edit_rate,
+         vocabulary, distance, seed):
+    index = SimHashIndex(distance)
+    hash_time = index_time = 0
+    duplicates = detected = false_positives = 0
+    for page, (tokens, original) in enumerate(make_pages(
+            count, words, template_words, duplicate_rate, edit_rate,
+            vocabulary, seed)):
+        start = time.perf_counter()
+        fingerprint = simhash(tokens)
+        hash_time += time.perf_counter() - start
+        start = time.perf_counter()
+        match = index.check_and_add(fingerprint, page)
+        index_time += time.perf_counter() - start
+        if original is not None:
+            duplicates += 1
+            detected += match is not None
+        elif match is not None:
+            false_positives += 1
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.simhash")
+        start = time.perf_counter()
+        index.dump(path)
+        dump_time = time.perf_counter() - start
+        size = os.path.getsize(path)
+        start = time.perf_counter()
+        SimHashIndex.load(path)
+        load_time = time.perf_counter() - start
+    unique = count - duplicates
+    print(f"{'pages':<24}{count} ({duplicates} near duplicates)")
+    print(f"{'simhash_pages_per_s':<24}{count / hash_time:.0f}")
+    print(f"{'index_lookups_per_s':<24}{count / index_time:.0f}")
+    print(f"{'recall':<24}{detected / max(1, duplicates):.4f}")
+    print(f"{'false_positive_rate':<24}{false_positives / unique:.4f}")
+    print(f"{'index_entries':<24}{len(index)}")
+    print(f"{'index_memory_kb':<24}{index.nbytes / 1024:.0f}")
+    print(f"{'dump_kb':<24}{size / 1024:.0f}")
+    print(f"{'dump_ms':<24}{dump_time * 1000:.1f}")
+    print(f"{'load_ms':<24}{load_time * 1000:.1f}")
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser(
+        description="Measure SimHash near duplicate detection on synthetic "
+                    "pages.")
+    parser.add_argument("--pages", type=int, default=100000)
+    parser.add_argument("--words", type=int, default=500)
+    parser.add_argument(
+        "--template_words", type=int, default=200,
+        help="Words at the start of every page, shared by all pages.")
+    parser.add_argument(
+        "--duplicate_rate", type=float, default=0.3,
+        help="Fraction of pages that are edited copies of earlier pages.")
+    parser.add_argument(
+        "--edit_rate", type=float, default=0.01,
+        help="Fraction of the words of a copy that are replaced.")
+    parser.add_argument("--vocabulary", type=int, default=50000)
+    parser.add_argument("--distance", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    main(args.pages, args.words, args.template_words, args.duplicate_rate,
+         args.edit_rate, args.vocabulary, args.distance, args.seed)
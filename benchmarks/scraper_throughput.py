@@ -0,0 +1,149 @@
+import sys
+import json
+import time
+import tracemalloc
+
+from argparse import ArgumentParser
+
+import scraper
+from scraper import extract_next_links, is_valid
+from benchmarks.corpus import DEFAULT_CORPUS, load_corpus, decode_pages
+
+# Results compared by --baseline; a drop in any of them fails the check.
+THROUGHPUT_KEYS = ("pages_per_s", "links_per_s", "is_valid_urls_per_s")
+
+
+def percentile(sorted_values, fraction):
+    index = min(len(sorted_values) - 1, int(fraction * len(sorted_values)))
+    return sorted_values[index]
+
+
+def bench_extract(responses, repeat):
+    latencies = list()
+    link_count = 0
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for url, resp in responses:
+            page_start = time.perf_counter()
+            link_count += len(extract_next_links(url, resp))
+            latencies.append(time.perf_counter() - page_start)
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return {
+        "pages": len(latencies),
+        "links": link_count,
+        "pages_per_s": len(latencies) / elapsed,
+        "links_per_s": link_count / elapsed,
+        "p50_ms": percentile(latencies, 0.50) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+    }
+
+
+def bench_is_valid(links, repeat):
+    start = time.perf_counter()
+    valid = 0
+    for _ in range(repeat):
+        for link in links:
+            if is_valid(link):
+                valid += 1
+    elapsed = time.perf_counter() - start
+    return {
+        "is_valid_urls": len(links) * repeat,
+        "is_valid_urls_per_s": len(links) * repeat / elapsed,
+        "is_valid_accepted": valid / repeat,
+    }
+
+
+def peak_memory(responses):
+    ''' Peak bytes allocated while extracting links from one page. Measured
+    in its own pass, since tracing slows everything down. '''
+    peak = 0
+    for url, resp in responses:
+        tracemalloc.start()
+        extract_next_links(url, resp)
+        peak = max(peak, tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+    return peak
+
+
+def compare(results, baseline, tolerance):
+    failures = list()
+    for key in THROUGHPUT_KEYS:
+        if key in baseline and results[key] < baseline[key] * (1 - tolerance):
+            failures.append(
+                f"{key} dropped from {baseline[key]:.1f} to "
+                f"{results[key]:.1f}")
+    return failures
+
+
+def compare_parsers(responses):
+    ''' Urls of the pages for which the parser backends disagree. '''
+    parser = scraper.PARSER
+    links = dict()
+    for backend in ("bs4", "lxml"):
+        scraper.PARSER = backend
+        links[backend] = [
+            extract_next_links(url, resp) for url, resp in responses]
+    scraper.PARSER = parser
+    return [
+        url for (url, _), bs4_links, lxml_links
+        in zip(responses, links["bs4"], links["lxml"])
+        if bs4_links != lxml_links]
+
+
+def main(paths, repeat, save, baseline, tolerance, parser, check_parsers):
+    responses = decode_pages(load_corpus(paths))
+    if check_parsers:
+        mismatches = compare_parsers(responses)
+        for url in mismatches:
+            print(f"MISMATCH: parser backends disagree on {url}")
+        print(f"Parser backends agree on "
+              f"{len(responses) - len(mismatches)}/{len(responses)} pages.")
+        if mismatches:
+            sys.exit(1)
+    scraper.PARSER = parser
+    links = [
+        link for url, resp in responses
+        for link in extract_next_links(url, resp)]
+    results = {"corpus": paths, "parser": parser}
+    results.update(bench_extract(responses, repeat))
+    results.update(bench_is_valid(links, repeat))
+    results["peak_memory_kb"] = peak_memory(responses) / 1024
+    for key, value in results.items():
+        print(f"{key:<22}{value:.2f}" if isinstance(value, float)
+              else f"{key:<22}{value}")
+    if save:
+        with open(save, "w") as out:
+            json.dump(results, out, indent=2)
+    if baseline:
+        with open(baseline) as baseline_file:
+            failures = compare(results, json.load(baseline_file), tolerance)
+        for failure in failures:
+            print(f"REGRESSION: {failure}")
+        if failures:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser(
+        description="Measure extract_next_links and is_valid over a corpus "
+                    "of html files and recordings (launch.py --record).")
+    parser.add_argument("corpus", nargs="*", default=DEFAULT_CORPUS)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument(
+        "--save", type=str, default=None, help="Write the results as json.")
+    parser.add_argument(
+        "--baseline", type=str, default=None,
+        help="Results saved earlier; exit 1 if throughput dropped.")
+    parser.add_argument(
+        "--tolerance", type=float, default=0.10,
+        help="Allowed throughput drop against the baseline.")
+    parser.add_argument(
+        "--parser", choices=["lxml", "bs4"], default=scraper.PARSER,
+        help="Link extraction backend to measure.")
+    parser.add_argument(
+        "--check_parsers", action="store_true", default=False,
+        help="First check that all backends extract the same links.")
+    args = parser.parse_args()
+    main(args.corpus, args.repeat, args.save, args.baseline, args.tolerance,
+         args.parser, args.check_parsers)
@@ -0,0 +1,92 @@
+import os
+import time
+import shelve
+import tempfile
+import tracemalloc
+
+from argparse import ArgumentParser
+
+from utils import get_urlhash, get_fingerprint
+from crawler.seen import FingerprintSet
+
+
+def make_urlhashes(count, offset=0):
+    return [
+        get_urlhash(f"https://www.ics.uci.edu/page/{offset + i}")
+        for i in range(count)]
+
+
+def timed_lookups(contains, keys):
+    start = time.perf_counter()
+    hits = sum(1 for key in keys if contains(key))
+    return len(keys) / (time.perf_counter() - start), hits
+
+
+def bench_shelve(urlhashes, probes, misses):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.shelve")
+        start = time.perf_counter()
+        with shelve.open(path) as save:
+            for urlhash in urlhashes:
+                save[urlhash] = ("url", False)
+        build = time.perf_counter() - start
+        disk = sum(
+            os.path.getsize(os.path.join(tmp, name))
+            for name in os.listdir(tmp))
+        with shelve.open(path) as save:
+            hit_rate, _ = timed_lookups(save.__contains__, probes)
+            miss_rate, _ = timed_lookups(save.__contains__, misses)
+    return build, disk, hit_rate, miss_rate
+
+
+def bench_seen(urlhashes, probes, misses):
+    start = time.perf_counter()
+    seen = FingerprintSet()
+    for urlhash in urlhashes:
+        seen.add(get_fingerprint(urlhash))
+    build = time.perf_counter() - start
+    memory = seen.nbytes
+    contains = lambda urlhash: get_fingerprint(urlhash) in seen
+    hit_rate, _ = timed_lookups(contains, probes)
+    miss_rate, _ = timed_lookups(contains, misses)
+    return build, memory, hit_rate, miss_rate
+
+
+def bench_str_set(urlhashes, probes, misses):
+    tracemalloc.start()
+    # Copy the strings so their memory is traced too.
+    seen = set(urlhash[:-1] + urlhash[-1] for urlhash in urlhashes)
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    hit_rate, _ = timed_lookups(seen.__contains__, probes)
+    miss_rate, _ = timed_lookups(seen.__contains__, misses)
+    return memory, hit_rate, miss_rate
+
+
+def main(count, probe_count):
+    urlhashes = make_urlhashes(count)
+    probes = urlhashes[::max(1, count // probe_count)][:probe_count]
+    misses = make_urlhashes(probe_count, offset=count)
+    print(f"{count} urls, {probe_count} hit and miss probes each.")
+    print(f"{'seen check':<22}{'build s':>9}{'bytes/url':>11}"
+          f"{'hits/s':>12}{'misses/s':>12}")
+
+    build, disk, hit_rate, miss_rate = bench_shelve(urlhashes, probes, misses)
+    print(f"{'shelve (disk)':<22}{build:>9.1f}{disk / count:>11.1f}"
+          f"{hit_rate:>12.0f}{miss_rate:>12.0f}")
+    memory, hit_rate, miss_rate = bench_str_set(urlhashes, probes, misses)
+    print(f"{'set of hex urlhash':<22}{'-':>9}{memory / count:>11.1f}"
+          f"{hit_rate:>12.0f}{miss_rate:>12.0f}")
+    build, memory, hit_rate, miss_rate = bench_seen(urlhashes, probes, misses)
+    print(f"{'FingerprintSet':<22}{build:>9.1f}{memory / count:>11.1f}"
+          f"{hit_rate:>12.0f}{miss_rate:>12.0f}")
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser(
+        description="Compare the seen-url check of the shelve save file "
+                    "with the in-memory fingerprint set.")
+    parser.add_argument("--urls", type=int, default=1000000)
+    parser.add_argument("--probes", type=int, default=100000)
+    args = parser.parse_args()
+    main(args.urls, args.probes)
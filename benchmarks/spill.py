@@ -0,0 +1,98 @@
+import os
+import time
+import heapq
+import tempfile
+import tracemalloc
+
+from argparse import ArgumentParser
+from threading import Lock
+
+from crawler.spill import SpillQueue
+
+
+def synthetic_urls(count):
+    hosts = ["www.ics.uci.edu", "www.cs.uci.edu", "www.stat.uci.edu",
+             "www.informatics.uci.edu"]
+    for number in range(count):
+        yield (
+            number % 7,
+            f"https://{hosts[number % len(hosts)]}/people/faculty/"
+            f"{number:09d}/publications")
+
+
+def in_memory(count):
+    ''' Every pending url in the frontier's per-host heaps. '''
+    queues = dict()
+    start = time.perf_counter()
+    for sequence, (depth, url) in enumerate(synthetic_urls(count)):
+        host = url.split("/")[2]
+        heapq.heappush(
+            queues.setdefault(host, list()),
+            ((depth, sequence), url, depth, None))
+    return queues, time.perf_counter() - start
+
+
+def spilled(count, budget, directory, lock):
+    ''' The first budget urls in the heaps, the rest in a SpillQueue. '''
+    queue = SpillQueue(directory, max(1, budget // 4))
+    queues, _ = in_memory(min(count, budget))
+    start = time.perf_counter()
+    for depth, url in synthetic_urls(count):
+        if budget:
+            budget -= 1
+            continue
+        with lock:
+            queue.append(depth, url)
+        if queue.unwritten:
+            queue.io(lock)
+    with lock:
+        queue.seal()
+    queue.io(lock)
+    append_time = time.perf_counter() - start
+    return queues, queue, append_time
+
+
+def measure(function, *args):
+    tracemalloc.start()
+    result = function(*args)
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, current, peak
+
+
+def main(count, budget):
+    (_, heap_time), heap_bytes, _ = measure(in_memory, count)
+    with tempfile.TemporaryDirectory() as tmp:
+        directory = os.path.join(tmp, "spill")
+        lock = Lock()
+        (_, queue, append_time), spill_bytes, spill_peak = measure(
+            spilled, count, budget, directory, lock)
+        disk_bytes = sum(
+            os.path.getsize(os.path.join(directory, name))
+            for name in os.listdir(directory))
+        spill_count = len(queue)
+        start = time.perf_counter()
+        while queue:
+            with lock:
+                queue.pop(budget)
+            queue.io(lock)
+        pop_time = time.perf_counter() - start
+    print(f"{'pending_urls':<24}{count}")
+    print(f"{'in_memory_mb':<24}{heap_bytes / 1e6:.1f}")
+    print(f"{'spilled_mb':<24}{spill_bytes / 1e6:.1f} "
+          f"(peak {spill_peak / 1e6:.1f}) with {budget} urls in memory")
+    print(f"{'disk_mb':<24}{disk_bytes / 1e6:.1f} "
+          f"({disk_bytes / max(spill_count, 1):.1f} bytes per url)")
+    print(f"{'heap_push_urls_per_s':<24}{count / heap_time:.0f}")
+    print(f"{'spill_urls_per_s':<24}{spill_count / append_time:.0f} append, "
+          f"{spill_count / pop_time:.0f} pop")
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser(
+        description="Compare the memory of keeping every pending url in the "
+                    "frontier with spilling all but QUEUEMEMORY of them.")
+    parser.add_argument("--urls", type=int, default=1000000)
+    parser.add_argument("--budget", type=int, default=100000)
+    args = parser.parse_args()
+    main(args.urls, args.budget)
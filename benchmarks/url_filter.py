@@ -0,0 +1,137 @@
+import re
+import sys
+import time
+import random
+
+from argparse import ArgumentParser
+from urllib.parse import urlparse
+
+from scraper import extract_next_links, is_valid, filter_urls, URL_FILTER
+from benchmarks.corpus import DEFAULT_CORPUS, load_corpus, decode_pages
+
+
+# is_valid as it was before it was compiled into scraper.URL_FILTER, kept as
+# the reference the filter must agree with. Its hardcoded robots.txt
+# prefixes are left out: crawler/robots.py fetches the real rules now.
+REFERENCE_EXTENSIONS = re.compile(
+    r".*\.(css|js|bmp|gif|jpe?g|ico|png|tiff?|svg|webp|"
+    r"mid|mp2|mp3|mp4|wav|avi|mov|mpeg|ram|m4v|mkv|ogg|ogv|webm|"
+    r"wmv|flv|"
+    r"pdf|ps|eps|tex|ppt|pptx|pps|ppsx|doc|docx|xls|xlsx|"
+    r"zip|rar|gz|tgz|bz2|7z|tar|"
+    r"exe|msi|bin|dmg|iso|dll|"
+    r"csv|tsv|arff|rtf|jar|war)$",
+    re.IGNORECASE,
+)
+
+def reference_is_valid(url):
+    try:
+        if not url or not isinstance(url, str):
+            return False
+        p = urlparse(url)
+        if p.scheme not in ("http", "https"):
+            return False
+        if p.query:
+            return False
+        host = (p.hostname or "").lower().rstrip(".")
+        if host.startswith("www."):
+            host = host[4:]
+        if host not in {
+                "ics.uci.edu", "cs.uci.edu", "informatics.uci.edu",
+                "stat.uci.edu"}:
+            return False
+        path = (p.path or "").lower()
+        if REFERENCE_EXTENSIONS.match(path):
+            return False
+        if len(path) > 300:
+            return False
+        if path.count("/") > 10:
+            return False
+        if any(tok in path for tok in (
+                "/calendar/", "/events/", "/wp-json/", "/cgi-bin/")):
+            return False
+        if any(tok in path for tok in (
+                ";jsessionid=", "sessionid", "phpsessid")):
+            return False
+        return True
+    except Exception:
+        return False
+
+
+MUTATIONS = (
+    lambda url: url + "?page=2",
+    lambda url: url.rstrip("/") + "/paper.PDF",
+    lambda url: url.rstrip("/") + "/archive.tar.gz",
+    lambda url: url.rstrip("/") + "/calendar/2019-01",
+    lambda url: url.rstrip("/") + "/events/",
+    lambda url: url.rstrip("/") + ";jsessionid=ABC123",
+    lambda url: url.rstrip("/") + "/x" * 12,
+    lambda url: url.rstrip("/") + "/" + "a" * 320,
+    lambda url: url.replace("://", "://www.", 1),
+    lambda url: url.replace("://www.", "://", 1),
+    lambda url: url.replace(".uci.edu", ".UCI.EDU", 1),
+    lambda url: url.replace(".uci.edu", ".uci.edu.", 1),
+    lambda url: url.replace(".uci.edu", ".uci.edu:8080", 1),
+    lambda url: url.replace(".uci.edu", ".mit.edu", 1),
+    lambda url: url.replace("https://", "ftp://", 1),
+    lambda url: url.replace("http://", "mailto:", 1),
+    lambda url: url.rstrip("/") + "/People/index.html",
+    lambda url: url.rstrip("/") + "/happening",
+    lambda url: url.rstrip("/") + "/peoples",
+    lambda url: url.rstrip("/") + ";params",
+    lambda url: url.replace(".uci.edu", ".uci.edu]", 1),
+)
+
+def build_links(responses, seed):
+    ''' The links of every page, as they repeat from page to page, plus one
+    variant per link that exercises each rule. '''
+    random.seed(seed)
+    links = [
+        link for url, resp in responses
+        for link in extract_next_links(url, resp)]
+    variants = [random.choice(MUTATIONS)(link) for link in links]
+    return links + variants + ["", None, 42, "https://", "//ics.uci.edu/"]
+
+
+def timed(function, links, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        function(links)
+    return len(links) * repeat / (time.perf_counter() - start)
+
+
+def main(paths, repeat, seed):
+    links = build_links(decode_pages(load_corpus(paths)), seed)
+    mismatches = [
+        link for link in links if is_valid(link) != reference_is_valid(link)]
+    for link in mismatches:
+        print(f"MISMATCH: {link!r}")
+    print(f"Verdicts agree on {len(links) - len(mismatches)}/{len(links)} "
+          f"urls, {sum(1 for link in links if is_valid(link))} valid.")
+    reference = timed(
+        lambda urls: [url for url in urls if reference_is_valid(url)],
+        links, repeat)
+    def uncached(urls):
+        URL_FILTER.cache_clear()
+        return filter_urls(urls)
+    cold = timed(uncached, links, repeat)
+    compiled = timed(filter_urls, links, repeat)
+    print(f"{'reference_urls_per_s':<22}{reference:.0f}")
+    print(f"{'uncached_urls_per_s':<22}{cold:.0f}")
+    print(f"{'filter_urls_per_s':<22}{compiled:.0f}")
+    print(f"{'speedup':<22}{cold / reference:.1f}x uncached, "
+          f"{compiled / reference:.1f}x cached")
+    print(f"{'cache':<22}{URL_FILTER.cache_info()}")
+    if mismatches:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser(
+        description="Check scraper.URL_FILTER against the original is_valid "
+                    "and compare their throughput.")
+    parser.add_argument("corpus", nargs="*", default=DEFAULT_CORPUS)
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    main(args.corpus, args.repeat, args.seed)
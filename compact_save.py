@@ -0,0 +1,23 @@
+from configparser import ConfigParser
+from argparse import ArgumentParser
+
+from crawler.store import compact
+
+
+def main(config_file, save_file):
+    if not save_file:
+        cparser = ConfigParser()
+        cparser.read(config_file)
+        save_file = cparser["LOCAL PROPERTIES"]["SAVE"]
+    before, after, count = compact(save_file)
+    print(f"Compacted {save_file}: {count} urls, {before} -> {after} bytes.")
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser(
+        description="Compact the log save file. Do not run it while the "
+                    "crawler is running.")
+    parser.add_argument("--config_file", type=str, default="config.ini")
+    parser.add_argument("--save_file", type=str, default=None)
+    args = parser.parse_args()
+    main(args.config_file, args.save_file)
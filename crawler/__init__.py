@@ -1,18 +1,26 @@
+import time
+
 from utils import get_logger
 from crawler.frontier import Frontier
-from crawler.worker import Worker
+from crawler.worker import Worker, PagePipeline
 
 class Crawler(object):
-    def __init__(self, config, restart, frontier_factory=Frontier, worker_factory=Worker):
+    def __init__(self, config, restart, frontier_factory=Frontier, worker_factory=Worker, pipeline=None):
         self.config = config
+        self.pipeline = pipeline if pipeline is not None else PagePipeline()
         self.logger = get_logger("CRAWLER")
+        start = time.time()
         self.frontier = frontier_factory(config, restart)
+        self.logger.info(
+            f"Frontier {'restarted' if restart else 'resumed'} in "
+            f"{time.time() - start:.3f} seconds.")
         self.workers = list()
         self.worker_factory = worker_factory
 
     def start_async(self):
         self.workers = [
-            self.worker_factory(worker_id, self.config, self.frontier)
+            self.worker_factory(
+                worker_id, self.config, self.frontier, self.pipeline)
             for worker_id in range(self.config.threads_count)]
         for worker in self.workers:
             worker.start()
@@ -22,5 +30,9 @@ class Crawler(object):
         self.join()
 
     def join(self):
-        for worker in self.workers:
-            worker.join()
+        try:
+            for worker in self.workers:
+                worker.join()
+        finally:
+            # Also on Ctrl-C, so the frontier's state is saved.
+            self.frontier.close()
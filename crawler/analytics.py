@@ -0,0 +1,190 @@
+import os
+import pickle
+
+from collections import Counter
+from threading import Lock
+from urllib.parse import urldefrag
+
+from utils import get_logger, get_urlhash, get_fingerprint, get_host
+from utils.text import tokenize
+
+# Split like the page text, so "don't" gives "don" and "t".
+STOPWORDS = frozenset(tokenize("""
+a about above after again against all am an and any are aren't as at be
+because been before being below between both but by can't cannot could
+couldn't did didn't do does doesn't doing don't down during each few for
+from further had hadn't has hasn't have haven't having he he'd he'll he's
+her here here's hers herself him himself his how how's i i'd i'll i'm i've
+if in into is isn't it it's its itself let's me more most mustn't my myself
+no nor not of off on once only or other ought our ours ourselves out over
+own same shan't she she'd she'll she's should shouldn't so some such than
+that that's the their theirs them themselves then there there's these they
+they'd they'll they're they've this those through to too under until up
+very was wasn't we we'd we'll we're we've were weren't what what's when
+when's where where's which while who who's whom why why's with won't would
+wouldn't you you'd you'll you're you've your yours yourself yourselves
+"""))
+
+
+def counted_words(tokens):
+    ''' The tokens that count towards word frequencies: no stopwords and no
+    single characters, which are mostly the pieces of contractions. '''
+    return [
+        token for token in tokens
+        if len(token) > 1 and token not in STOPWORDS]
+
+
+def format_report(page_count, longest, words, subdomains, top=50):
+    longest_words, longest_url = longest
+    lines = [
+        f"Unique pages: {page_count}",
+        f"Longest page: {longest_url} ({longest_words} words)",
+        "",
+        f"{top} most common words:"]
+    lines.extend(f"{word}, {count}" for word, count in words.most_common(top))
+    subdomains = sorted(
+        (host, count) for host, count in subdomains.items()
+        if host == "uci.edu" or host.endswith(".uci.edu"))
+    lines.append("")
+    lines.append(f"Subdomains of uci.edu: {len(subdomains)}")
+    lines.extend(f"{host}, {count}" for host, count in subdomains)
+    return "\n".join(lines) + "\n"
+
+
+class CrawlAnalytics(object):
+    ''' Crawl statistics gathered from the pages as they are crawled.
+
+    Keeps the word frequencies without stopwords, the longest page in words,
+    the number of unique pages and the pages per subdomain. Every page is
+    appended to a journal next to the analytics file as soon as it is
+    counted, before the frontier marks it complete, so a killed crawl loses
+    no page it will not fetch again. Every checkpoint_every pages only what
+    changed since the last checkpoint is appended to the analytics file and
+    the journal is emptied, so a checkpoint costs the same however long the
+    crawl has run. Resuming reads the checkpoints, then the journal. With
+    readonly the files are only read, so the statistics of a running crawl
+    can be looked at. '''
+    def __init__(self, path, restart, checkpoint_every=1000, readonly=False):
+        self.logger = get_logger("ANALYTICS", "CRAWLER")
+        self.path = path
+        self.journal_path = f"{path}.pages"
+        self.checkpoint_every = checkpoint_every
+        self.words = Counter()
+        self.subdomains = Counter()
+        self.pages = set()
+        self.longest = (0, None)
+        # Changes since the last checkpoint.
+        self.new_words = Counter()
+        self.new_pages = list()
+        self.lock = Lock()
+        if restart:
+            for stale in (path, self.journal_path):
+                if os.path.exists(stale):
+                    os.remove(stale)
+        self._load(readonly)
+        self.file = self.journal = None
+        if not readonly:
+            self.file = open(path, "ab")
+            self.journal = open(self.journal_path, "ab")
+
+    def _load(self, readonly):
+        for pages, words, longest in _read_pickles(self.path, readonly):
+            for fingerprint, host in pages:
+                self.pages.add(fingerprint)
+                self.subdomains[host] += 1
+            self.words.update(words)
+            self.longest = max(self.longest, tuple(longest))
+        # Pages counted since the last checkpoint; they go into the next.
+        for fingerprint, host, words, length, url in _read_pickles(
+                self.journal_path, readonly):
+            self._count(fingerprint, host, words, length, url)
+        self.logger.info(
+            f"Loaded analytics of {len(self.pages)} pages from {self.path}.")
+
+    def record(self, url, words=None, length=0):
+        ''' Counts a crawled page. words is the Counter of the counted_words
+        of its visible text and length its number of words; None and 0 when
+        its text was counted under another url. '''
+        url, _ = urldefrag(url)
+        fingerprint = get_fingerprint(get_urlhash(url))
+        host = get_host(url)
+        words = words or Counter()
+        with self.lock:
+            if not self._count(fingerprint, host, words, length, url):
+                return
+            if self.journal is not None:
+                pickle.dump(
+                    (fingerprint, host, dict(words), length, url),
+                    self.journal, protocol=pickle.HIGHEST_PROTOCOL)
+                self.journal.flush()
+            due = len(self.new_pages) >= self.checkpoint_every
+        if due:
+            self.checkpoint()
+
+    def _count(self, fingerprint, host, words, length, url):
+        # Returns False for a page counted already, crawled again after a
+        # restart. Call with the lock held.
+        if fingerprint in self.pages:
+            return False
+        self.pages.add(fingerprint)
+        self.subdomains[host] += 1
+        self.new_pages.append((fingerprint, host))
+        if length:
+            self.words.update(words)
+            self.new_words.update(words)
+            self.longest = max(self.longest, (length, url))
+        return True
+
+    def checkpoint(self):
+        with self.lock:
+            if not self.new_pages or self.file is None:
+                return
+            pickle.dump(
+                (self.new_pages, dict(self.new_words), self.longest),
+                self.file, protocol=pickle.HIGHEST_PROTOCOL)
+            self.file.flush()
+            # The journaled pages are in the checkpoint now. Should the
+            # crawl stop before this, they are skipped as counted already.
+            self.journal.truncate(0)
+            self.new_pages = list()
+            self.new_words = Counter()
+
+    def report(self, top=50):
+        with self.lock:
+            return format_report(
+                len(self.pages), self.longest, self.words, self.subdomains,
+                top)
+
+    def write_report(self, path):
+        with open(path, "w") as report:
+            report.write(self.report())
+        self.logger.info(f"Wrote the crawl report to {path}.")
+
+    def close(self):
+        self.checkpoint()
+        with self.lock:
+            if self.file is not None:
+                self.file.close()
+                self.journal.close()
+                # Pages of workers still running after a Ctrl-C are fetched
+                # again on resume.
+                self.file = self.journal = None
+
+
+def _read_pickles(path, readonly):
+    ''' Yields the pickled records of path up to a torn last one, which is
+    dropped unless readonly. '''
+    if not os.path.exists(path):
+        return
+    valid_size = 0
+    with open(path, "rb") as log:
+        while True:
+            try:
+                record = pickle.load(log)
+            except (EOFError, pickle.UnpicklingError, ValueError):
+                break
+            valid_size = log.tell()
+            yield record
+    if not readonly and os.path.getsize(path) > valid_size:
+        with open(path, "r+b") as log:
+            log.truncate(valid_size)
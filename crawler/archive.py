@@ -0,0 +1,204 @@
+import os
+import mmap
+import json
+import shutil
+import struct
+import zlib
+
+from threading import Lock
+from binascii import unhexlify
+
+from utils import get_logger, get_urlhash
+
+# A segment is a sequence of records, each this header followed by the
+# zlib compressed page:
+#   crc32 of the compressed page | compressed length
+RECORD_HEADER = struct.Struct("<II")
+# The page itself, before compression, is this header followed by the utf-8
+# url, the response headers as utf-8 json and the body:
+#   http status | flags | url length | headers length | body length
+# ALIAS is set in flags when the body is the same as an earlier page's, so
+# the crawl did not parse it.
+PAGE_HEADER = struct.Struct("<HBIII")
+ALIAS = 1
+# The index is a sequence of entries, one per record:
+#   sha256 urlhash (raw bytes) | segment number | offset in the segment
+INDEX_ENTRY = struct.Struct("<32sIQ")
+INDEX_FILE = "index"
+# zlib level 1 compresses html about 4x at a fraction of the cost of the
+# default level.
+COMPRESSION_LEVEL = 1
+
+
+def segment_path(directory, number):
+    return os.path.join(directory, f"segment-{number:05d}.arc")
+
+
+def segment_numbers(directory):
+    return sorted(
+        int(name[8:13]) for name in os.listdir(directory)
+        if name.startswith("segment-") and name.endswith(".arc"))
+
+
+def encode_page(url, status, headers, body, alias=False):
+    url = url.encode("utf-8")
+    headers = json.dumps(headers).encode("utf-8")
+    page = zlib.compress(
+        PAGE_HEADER.pack(
+            status, ALIAS if alias else 0, len(url), len(headers), len(body))
+        + url + headers + body, COMPRESSION_LEVEL)
+    return RECORD_HEADER.pack(zlib.crc32(page), len(page)) + page
+
+
+def decode_page(page):
+    status, flags, url_length, headers_length, body_length = (
+        PAGE_HEADER.unpack_from(page))
+    start = PAGE_HEADER.size
+    url = page[start:start + url_length].decode("utf-8")
+    start += url_length
+    headers = json.loads(page[start:start + headers_length])
+    start += headers_length
+    return (
+        url, status, headers, page[start:start + body_length],
+        bool(flags & ALIAS))
+
+
+class ArchiveWriter(object):
+    ''' Appends every downloaded page to the archive directory.
+
+    Pages go to segment files of about segment_size bytes; a new segment is
+    started when the current one is full and on every run, so a torn record
+    left by a crash is always at the end of a segment. Every record is also
+    added to the index, urlhash -> (segment, offset), for ArchiveReader.
+    Every record, then its index entry, is handed to the OS as it is
+    written, before the frontier marks the page complete, so a killed crawl
+    keeps every page it will not fetch again and the index never points
+    past the segments. sync() makes them durable on disk too. '''
+    def __init__(self, directory, restart, segment_size=1 << 28):
+        self.logger = get_logger("ARCHIVE", "CRAWLER")
+        self.directory = directory
+        self.segment_size = segment_size
+        if restart and os.path.exists(directory):
+            shutil.rmtree(directory)
+        os.makedirs(directory, exist_ok=True)
+        numbers = segment_numbers(directory)
+        self.segment_number = numbers[-1] if numbers else -1
+        self.segment = None
+        self.index = open(os.path.join(directory, INDEX_FILE), "ab")
+        self.lock = Lock()
+        self._rotate()
+
+    def _rotate(self):
+        if self.segment is not None:
+            self._sync()
+            self.segment.close()
+        self.segment_number += 1
+        self.segment = open(
+            segment_path(self.directory, self.segment_number), "ab")
+
+    def write(self, url, resp, alias=False):
+        ''' Archives a response that has a page. alias when its body is the
+        same as an earlier page's. '''
+        raw_response = resp.raw_response
+        if raw_response is None:
+            return
+        # Compress before taking the lock; zlib releases the GIL.
+        record = encode_page(
+            url, resp.status, dict(raw_response.headers),
+            raw_response.content or b"", alias)
+        urlhash = unhexlify(get_urlhash(url))
+        with self.lock:
+            if self.segment.tell() >= self.segment_size:
+                self._rotate()
+            offset = self.segment.tell()
+            self.segment.write(record)
+            self.segment.flush()
+            self.index.write(
+                INDEX_ENTRY.pack(urlhash, self.segment_number, offset))
+            self.index.flush()
+
+    def sync(self):
+        ''' Makes the pages written so far durable: the segment first, then
+        the index. '''
+        with self.lock:
+            self._sync()
+
+    def _sync(self):
+        self.segment.flush()
+        os.fsync(self.segment.fileno())
+        self.index.flush()
+        os.fsync(self.index.fileno())
+
+    def close(self):
+        with self.lock:
+            self._sync()
+            self.segment.close()
+            self.index.close()
+
+
+class ArchiveReader(object):
+    ''' Reads an archive through memory maps of its segments.
+
+    get(url) seeks straight to a page through the index; iterating reads
+    every segment front to back. Pages are (url, status, headers, body,
+    alias).
+    Without load_index only read_at and iterating work. '''
+    def __init__(self, directory, load_index=True):
+        self.directory = directory
+        self.segments = dict()
+        for number in segment_numbers(directory):
+            with open(segment_path(directory, number), "rb") as segment:
+                if os.fstat(segment.fileno()).st_size:
+                    self.segments[number] = mmap.mmap(
+                        segment.fileno(), 0, access=mmap.ACCESS_READ)
+        self.index = dict()
+        index_path = os.path.join(directory, INDEX_FILE)
+        if load_index and os.path.exists(index_path):
+            with open(index_path, "rb") as index:
+                entries = index.read()
+            for urlhash, number, offset in INDEX_ENTRY.iter_unpack(
+                    entries[:len(entries) - len(entries) % INDEX_ENTRY.size]):
+                self.index[urlhash] = (number, offset)
+
+    def __len__(self):
+        return len(self.index)
+
+    def _read(self, segment, offset):
+        ''' The compressed page at offset and the offset of the next record;
+        None for the page if the record is torn or corrupt. '''
+        if offset + RECORD_HEADER.size > len(segment):
+            return None, len(segment)
+        crc, length = RECORD_HEADER.unpack_from(segment, offset)
+        start = offset + RECORD_HEADER.size
+        page = segment[start:start + length]
+        if len(page) < length or zlib.crc32(page) != crc:
+            return None, len(segment)
+        return page, start + length
+
+    def get(self, url):
+        location = self.index.get(unhexlify(get_urlhash(url)))
+        if location is None:
+            return None
+        return self.read_at(*location)
+
+    def read_at(self, number, offset):
+        ''' The page of the record at offset in segment number, or None. '''
+        if number not in self.segments:
+            return None
+        page, _ = self._read(self.segments[number], offset)
+        if page is None:
+            return None
+        return decode_page(zlib.decompress(page))
+
+    def __iter__(self):
+        for number in sorted(self.segments):
+            segment = self.segments[number]
+            offset = 0
+            while offset < len(segment):
+                page, offset = self._read(segment, offset)
+                if page is not None:
+                    yield decode_page(zlib.decompress(page))
+
+    def close(self):
+        for segment in self.segments.values():
+            segment.close()
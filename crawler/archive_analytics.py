@@ -0,0 +1,77 @@
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from utils import get_host
+from utils.text import visible_text, tokenize
+from crawler.archive import ArchiveReader
+from crawler.analytics import counted_words
+
+
+def empty_partial():
+    # pages | (words, url) of the longest page | word counts | pages per host
+    return [0, (0, None), Counter(), Counter()]
+
+
+def analyze_pages(directory, locations):
+    ''' Map: the partial statistics of the archived pages at locations. Every
+    page is decoded and tokenized exactly once. Pages count as in the crawl
+    (see crawler.worker.PagePipeline): an alias of an earlier page without its
+    words, otherwise html pages with their words. '''
+    reader = ArchiveReader(directory, load_index=False)
+    partial = empty_partial()
+    for number, offset in locations:
+        page = reader.read_at(number, offset)
+        if page is None:
+            continue
+        url, status, headers, body, alias = page
+        content_type = next((
+            value.lower() for name, value in headers.items()
+            if name.lower() == "content-type"), "")
+        if alias:
+            tokens = None
+        elif status == 200 and "text/html" in content_type and body:
+            tokens = tokenize(visible_text(body, content_type))
+        else:
+            continue
+        partial[0] += 1
+        partial[3][get_host(url)] += 1
+        if tokens:
+            partial[1] = max(partial[1], (len(tokens), url))
+            partial[2].update(counted_words(tokens))
+    reader.close()
+    return partial
+
+
+def merge_partials(left, right):
+    ''' Reduce: adds the right partial to the left one. '''
+    left[0] += right[0]
+    left[1] = max(left[1], right[1])
+    left[2].update(right[2])
+    left[3].update(right[3])
+    return left
+
+
+def analyze_archive(directory, processes):
+    ''' Crawl statistics of every url in the archive, from its latest record.
+
+    The records are split into one chunk per process in archive order. Each
+    process sends back its partial result once, and this process merges
+    them as they arrive. Returns (pages, longest, word counts, pages per
+    host) as in crawler.analytics.format_report. '''
+    reader = ArchiveReader(directory)
+    locations = sorted(reader.index.values())
+    reader.close()
+    chunk_count = max(1, min(len(locations), processes))
+    # Contiguous chunks, so every process reads its segments front to back.
+    chunks = [
+        locations[len(locations) * part // chunk_count:
+                  len(locations) * (part + 1) // chunk_count]
+        for part in range(chunk_count)]
+    result = empty_partial()
+    with ProcessPoolExecutor(processes) as executor:
+        futures = [
+            executor.submit(analyze_pages, directory, chunk)
+            for chunk in chunks]
+        for future in as_completed(futures):
+            merge_partials(result, future.result())
+    return tuple(result)
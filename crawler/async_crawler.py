@@ -0,0 +1,152 @@
+import time
+import asyncio
+
+from concurrent.futures import ThreadPoolExecutor
+
+from utils import get_logger, get_host
+from utils.aiodownload import AsyncDownloader
+from crawler.frontier import Frontier
+from crawler.worker import PagePipeline
+
+
+class AsyncFrontier(object):
+    ''' asyncio view of a Frontier for use from a single event loop.
+
+    get_tbd_url awaits instead of blocking the thread: the loop sleeps until
+    the next host leaves its politeness window or until a url is added or
+    completed. The wrapped frontier keeps the state, storage and politeness
+    rules, so any frontier_factory works. Its calls take its lock and may
+    write to disk, so they run in the loop's default executor. '''
+    # While a frontier loads pending urls from a background thread, or gets
+    # them from other shards, the loop is not notified of them and polls at
+    # this interval instead.
+    LOADING_POLL = 0.1
+
+    def __init__(self, frontier):
+        self.frontier = frontier
+        self.changed = asyncio.Event()
+
+    async def get_tbd_url(self):
+        while True:
+            self.changed.clear()
+            url, delay, finished = await self._run(self._poll)
+            if url is not None:
+                return url
+            if finished:
+                return None
+            try:
+                await asyncio.wait_for(self.changed.wait(), delay)
+            except asyncio.TimeoutError:
+                pass
+
+    def _poll(self):
+        ''' Returns (url, delay, finished); runs in the executor. '''
+        url, delay = self.frontier.poll_tbd_url()
+        if url is not None or delay is not None:
+            return url, delay, False
+        if self.frontier.is_finished():
+            return None, None, True
+        if self.frontier.loading or self.frontier.shard is not None:
+            # Urls arrive from another thread.
+            return None, self.LOADING_POLL, False
+        return None, None, False
+
+    async def add_url(self, url, parent=None):
+        added = await self._run(self.frontier.add_url, url, parent)
+        self.changed.set()
+        return added
+
+    async def mark_url_complete(self, url):
+        await self._run(self.frontier.mark_url_complete, url)
+        self.changed.set()
+
+    async def complete_and_add(self, url, links):
+        added = await self._run(self.frontier.complete_and_add, url, links)
+        self.changed.set()
+        return added
+
+    async def record_page(self, url, new_urls):
+        await self._run(self.frontier.traps.record_page, url, new_urls)
+
+    async def _run(self, function, *args):
+        return await asyncio.get_running_loop().run_in_executor(
+            None, function, *args)
+
+
+class AsyncCrawler(object):
+    ''' Event loop counterpart of Crawler.
+
+    Runs ASYNCREQUESTS fetch tasks in one thread instead of one thread per
+    worker, so hundreds of requests to the cache server can be in flight.
+    Pages go through the same scraper.scraper contract; parsing runs in a
+    small thread pool so it does not stall the loop, and from there in the
+    parser processes when there are any. '''
+    def __init__(
+            self, config, restart, frontier_factory=Frontier, pipeline=None):
+        self.config = config
+        self.pipeline = pipeline if pipeline is not None else PagePipeline()
+        self.logger = get_logger("CRAWLER")
+        start = time.time()
+        self.frontier = frontier_factory(config, restart)
+        self.logger.info(
+            f"Frontier {'restarted' if restart else 'resumed'} in "
+            f"{time.time() - start:.3f} seconds.")
+        self.worker_logger = get_logger("AsyncWorker", "Worker")
+
+    def start(self):
+        try:
+            asyncio.run(self._crawl())
+        finally:
+            self.frontier.close()
+
+    async def _crawl(self):
+        frontier = AsyncFrontier(self.frontier)
+        downloader = AsyncDownloader(
+            self.config, self.worker_logger, self.pipeline.recorder)
+        with ThreadPoolExecutor(self.config.threads_count) as parse_pool:
+            await asyncio.gather(*(
+                self._fetch_loop(frontier, downloader, parse_pool)
+                for _ in range(self.config.async_requests)))
+        await downloader.close()
+        self.worker_logger.info("Frontier is empty. Stopping Crawler.")
+
+    async def _fetch_loop(self, frontier, downloader, parse_pool):
+        while True:
+            tbd_url = await frontier.get_tbd_url()
+            if not tbd_url:
+                break
+            scraped_urls = None
+            try:
+                scraped_urls = await self._process(
+                    downloader, parse_pool, tbd_url)
+            except Exception:
+                # Same as Worker: the url must still be marked complete.
+                self.worker_logger.exception(f"Failed to process {tbd_url}.")
+            new_urls = await frontier.complete_and_add(
+                tbd_url, scraped_urls or ())
+            if scraped_urls is not None:
+                await frontier.record_page(tbd_url, new_urls)
+
+    async def _process(self, downloader, parse_pool, tbd_url):
+        ''' Same as Worker._process. '''
+        loop = asyncio.get_running_loop()
+        robots = self.frontier.robots
+        if robots.needs_fetch(tbd_url):
+            await loop.run_in_executor(
+                parse_pool, robots.fetch, tbd_url, self.pipeline.recorder)
+            await asyncio.sleep(robots.delay(get_host(tbd_url)))
+        if not robots.allowed(tbd_url):
+            self.worker_logger.info(
+                f"Skipped {tbd_url}, disallowed by robots.txt.")
+            return None
+        if not self.frontier.traps.allowed(tbd_url):
+            self.worker_logger.info(
+                f"Skipped {tbd_url}, its url template was cut off.")
+            return None
+        resp = await downloader.download(tbd_url)
+        self.worker_logger.info(
+            f"Downloaded {tbd_url}, status <{resp.status}>, "
+            f"using cache {self.config.cache_server}.")
+        return await loop.run_in_executor(
+            parse_pool, self.pipeline.links, self.config, self.frontier,
+            self.worker_logger, tbd_url, resp)
@@ -0,0 +1,109 @@
+import os
+import struct
+
+from hashlib import blake2b
+from threading import Lock
+
+from utils import get_logger
+
+# Every record is this header followed by the utf-8 url:
+#   64 bit body digest | alias flag | url length
+# The first url with a digest is the original; later ones are its aliases.
+RECORD_HEADER = struct.Struct("<QBI")
+# Log the hit rate every this many pages checked.
+REPORT_EVERY = 1000
+
+
+def content_digest(content):
+    return int.from_bytes(blake2b(content, digest_size=8).digest(), "little")
+
+
+class ContentIndex(object):
+    ''' Digests of the bodies of the pages crawled so far.
+
+    Redirect targets, trailing slash variants and mirrors across the seed
+    domains often serve byte-identical pages. A page whose body was seen
+    before is an alias of the first url that served it, and is not parsed
+    again. Originals and aliases are appended to a file next to the save
+    file, so the index survives a restart and the aliases can be reported. '''
+    def __init__(self, path, restart):
+        self.logger = get_logger("CONTENT", "FRONTIER")
+        self.path = path
+        self.originals = dict()
+        self.alias_count = 0
+        # Per run counters for the hit rate.
+        self.checked = 0
+        self.hits = 0
+        self.lock = Lock()
+        if restart and os.path.exists(path):
+            os.remove(path)
+        valid_size = 0
+        for digest, url, alias in read_content_index(path):
+            if alias:
+                self.alias_count += 1
+            else:
+                self.originals.setdefault(digest, url)
+            valid_size += RECORD_HEADER.size + len(url.encode("utf-8"))
+        self.file = open(path, "ab")
+        if self.file.tell() > valid_size:
+            # Drop a torn last record before appending after it.
+            self.file.truncate(valid_size)
+            self.file.seek(valid_size)
+
+    def check_and_add(self, url, content):
+        ''' Returns the url that served content first, or records url as
+        serving it and returns None. A url fetched again after a restart is
+        not an alias of itself. '''
+        digest = content_digest(content)
+        with self.lock:
+            self.checked += 1
+            original = self.originals.get(digest)
+            if original == url:
+                return None
+            if original is None:
+                self.originals[digest] = url
+            else:
+                self.hits += 1
+                self.alias_count += 1
+            encoded = url.encode("utf-8")
+            self.file.write(RECORD_HEADER.pack(
+                digest, original is not None, len(encoded)) + encoded)
+            if self.checked % REPORT_EVERY == 0:
+                self.report()
+        return original
+
+    def report(self):
+        self.logger.info(
+            f"{self.hits} of {self.checked} pages checked this run had the "
+            f"same content as an earlier page "
+            f"({100 * self.hits / max(1, self.checked):.1f}%); "
+            f"{len(self.originals)} distinct pages, {self.alias_count} "
+            f"aliases in total.")
+
+    def sync(self):
+        ''' Hands the records written so far to the OS, so they survive the
+        crawler being killed. '''
+        with self.lock:
+            self.file.flush()
+
+    def close(self):
+        with self.lock:
+            self.report()
+            self.file.close()
+
+
+def read_content_index(path):
+    ''' Yields (digest, url, alias) for every record of the file. '''
+    if not os.path.exists(path):
+        return
+    with open(path, "rb") as index:
+        while True:
+            header = index.read(RECORD_HEADER.size)
+            if len(header) < RECORD_HEADER.size:
+                return
+            digest, alias, length = RECORD_HEADER.unpack(header)
+            url = index.read(length)
+            if len(url) < length:
+                # Torn last record of an interrupted crawl.
+                return
+            yield digest, url.decode("utf-8"), bool(alias)
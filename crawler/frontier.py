@@ -1,72 +1,615 @@
 import os
-import shelve
+import time
+import heapq
+import shutil
 
-from threading import Thread, RLock
-from queue import Queue, Empty
+from itertools import chain
+from threading import Thread, Lock, RLock, Condition
 
-from utils import get_logger, get_urlhash, normalize
+from utils import get_logger, get_urlhash, get_fingerprint, get_host, normalize
 from scraper import is_valid
+from crawler.store import ShelveStore, LogStore
+from crawler.seen import FingerprintSet
+from crawler.robots import Robots
+from crawler.simhash import SimHashIndex
+from crawler.content_index import ContentIndex
+from crawler.traps import TrapDetector
+from crawler.policy import make_policy
+from crawler.spill import SpillQueue
 
 class Frontier(object):
-    def __init__(self, config, restart):
+    def __init__(self, config, restart, shard=None):
         self.logger = get_logger("FRONTIER")
         self.config = config
-        self.to_be_downloaded = list()
+        # crawler.shard.Shard in each process of a sharded crawl: urls of
+        # the other shards' hosts are forwarded to them.
+        self.shard = shard
+        # Called after every checkpoint of a LogFrontier, for the files that
+        # have to be on disk along with it, such as the archive.
+        self.checkpoint_hooks = list()
+        # Pending urls grouped by host, each host a heap of
+        # (key, url, depth, parent) in the order of the queue policy. A host
+        # with pending urls has one entry in either waiting_hosts,
+        # (ready_time, host) while in its politeness window, or ready_hosts,
+        # (priority, host) once out of it, or is in busy_hosts while one of
+        # its urls is being downloaded. next_fetch remembers when each host
+        # may be fetched again, counted from the end of its last download.
+        self.policy = make_policy(self.config.queue_policy)
+        self.sequence = 0
+        self.to_be_downloaded = dict()
+        self.queued_count = 0
+        # Pending urls beyond QUEUEMEMORY wait on disk, in the order they
+        # were found, until the queues above have room for them.
+        self.spill_dir = f"{self.config.save_file}.spill"
+        self.spill = None
+        if self.config.queue_memory > 0:
+            self.spill = SpillQueue(
+                self.spill_dir, max(1, self.config.queue_memory // 4))
+        # Urls completed since the checkpoint a LogFrontier resumed from;
+        # they are skipped when read back from the checkpoint or the spill.
+        self.resumed_completed = set()
+        self.waiting_hosts = list()
+        self.ready_hosts = list()
+        self.busy_hosts = set()
+        self.next_fetch = dict()
+        # Workers block on the condition until a url is ready. in_flight
+        # maps the urls handed out but not yet marked complete to their
+        # depth, so their links are one deeper, and loading is
+        # set while pending urls are still being read from the save file;
+        # the crawl is over only when nothing is pending, in flight or
+        # loading.
+        self.lock = RLock()
+        self.has_work = Condition(self.lock)
+        self.in_flight = dict()
+        self.loading = False
+        self.completed_count = 0
+        # Set by close(). Workers still running then, after a Ctrl-C, get no
+        # more urls and their results are dropped; their urls stay pending.
+        self.closed = False
+        # Fingerprints of every url ever discovered, so the duplicate check
+        # never has to touch the save file.
+        self.seen = FingerprintSet()
+        # robots.txt rules and Crawl-delay of every host fetched so far.
+        self.robots = Robots(config)
         
-        if not os.path.exists(self.config.save_file) and not restart:
-            # Save file does not exist, but request to load save.
+        save_exists = self.save_file_exists(config)
+        if not save_exists and not restart:
+            # Save file does not exist, but request to load save. The files
+            # kept next to it are from another crawl, if any.
             self.logger.info(
                 f"Did not find save file {self.config.save_file}, "
                 f"starting from seed.")
-        elif os.path.exists(self.config.save_file) and restart:
+            restart = True
+        elif save_exists and restart:
             # Save file does exists, but request to start from seed.
             self.logger.info(
                 f"Found save file {self.config.save_file}, deleting it.")
-            os.remove(self.config.save_file)
+            self._remove_save_file()
         # Load existing save file, or create one if it does not exist.
-        self.save = shelve.open(self.config.save_file)
+        self.save = self._open_save_file()
+        self.near_duplicates = self._open_near_duplicates(restart)
+        # Digests of the page bodies crawled so far.
+        self.contents = ContentIndex(
+            f"{self.config.save_file}.content", restart)
+        self.traps = TrapDetector(
+            f"{self.config.save_file}.traps", restart,
+            self.config.trap_budget, self.config.trap_min_pages,
+            self.config.trap_min_novelty)
         if restart:
-            for url in self.config.seed_urls:
-                self.add_url(url)
+            if self.spill is not None:
+                self.spill.clear()
+            elif os.path.isdir(self.spill_dir):
+                # Left by a crawl with QUEUEMEMORY set.
+                shutil.rmtree(self.spill_dir)
+            self.add_urls(self.config.seed_urls)
         else:
             # Set the frontier state with contents of save file.
             self._parse_save_file()
-            if not self.save:
-                for url in self.config.seed_urls:
-                    self.add_url(url)
+            if not self.seen:
+                self.add_urls(self.config.seed_urls)
+
+    def _open_save_file(self):
+        ''' This function can be overridden for alternate storage backends. '''
+        return ShelveStore(self.config.save_file)
+
+    @classmethod
+    def save_file_exists(cls, config):
+        ''' Without it the crawl starts from the seeds, and so do the files
+        kept next to it. '''
+        return ShelveStore.exists(config.save_file)
+
+    def _remove_save_file(self):
+        ShelveStore.remove(self.config.save_file)
+
+    def _open_near_duplicates(self, restart):
+        ''' SimHash index of the pages crawled so far, saved next to the
+        save file. None when NEARDUPDISTANCE is negative. '''
+        path = f"{self.config.save_file}.simhash"
+        if restart and os.path.exists(path):
+            os.remove(path)
+        if self.config.near_duplicate_distance < 0:
+            return None
+        if os.path.exists(path):
+            try:
+                index = SimHashIndex.load(path)
+            except ValueError:
+                self.logger.warning(
+                    f"Ignoring {path}, a dump of an older version.")
+                return SimHashIndex(self.config.near_duplicate_distance)
+            if index.distance == self.config.near_duplicate_distance:
+                self.logger.info(
+                    f"Loaded {len(index)} page fingerprints from {path}.")
+                return index
+        return SimHashIndex(self.config.near_duplicate_distance)
+
+    def save_near_duplicates(self):
+        if self.near_duplicates is not None:
+            self.near_duplicates.dump(f"{self.config.save_file}.simhash")
+
+    def find_same_content(self, url, resp):
+        ''' The url of an earlier page with exactly the same body, so this
+        one need not be parsed; None when the body is new. '''
+        if resp.status != 200 or resp.raw_response is None:
+            return None
+        content = resp.raw_response.content
+        if not content:
+            return None
+        return self.contents.check_and_add(url, content)
+
+    def is_near_duplicate(self, url, fingerprint):
+        ''' True when the page at url, with this SimHash of its words, is a
+        near duplicate of another page crawled before, so its links need not
+        be followed again. Otherwise its fingerprint is added to the index.
+        fingerprint is None for a page with too few words to compare. '''
+        if self.near_duplicates is None or fingerprint is None:
+            return False
+        return self.near_duplicates.check_and_add(
+            fingerprint, get_fingerprint(get_urlhash(url))) is not None
+
+    def add_canonical(self, url, canonical):
+        ''' The page at url names canonical as its canonical url: unless
+        canonical was seen already, it is marked completed, so the page is
+        not downloaded again under it. Returns True when it was marked here,
+        see add_completed. '''
+        canonical = normalize(canonical)
+        if (get_urlhash(canonical) == get_urlhash(url)
+                or not is_valid(canonical)):
+            return False
+        return self.add_completed([canonical], url) == 1
+
+    def add_completed(self, urls, parent=None):
+        ''' Marks the urls that were not seen yet completed, so they are
+        never downloaded. Like add_urls, the urls of another shard's hosts
+        are forwarded to it, to be marked there. Returns the number marked
+        here. '''
+        _, batch, _ = self._prepare_urls(urls, parent, None, completed=True)
+        with self.has_work:
+            if self.closed:
+                return 0
+            records = [
+                (urlhash, url, True, 0) for urlhash, fingerprint, url in batch
+                if self.seen.add(fingerprint)]
+            if records:
+                self.save.put_many(records)
+        return len(records)
 
     def _parse_save_file(self):
         ''' This function can be overridden for alternate saving techniques. '''
-        total_count = len(self.save)
+        if self.spill is not None:
+            # Every pending url is in the save file.
+            self.spill.clear()
+        pending = dict()
+        for urlhash, url, completed, depth in self.save.records():
+            fingerprint = get_fingerprint(urlhash)
+            self.seen.add(fingerprint)
+            if completed:
+                pending.pop(fingerprint, None)
+            else:
+                pending[fingerprint] = (depth, url)
         tbd_count = 0
-        for url, completed in self.save.values():
-            if not completed and is_valid(url):
-                self.to_be_downloaded.append(url)
+        for depth, url in pending.values():
+            if is_valid(url):
+                self._enqueue(url, depth)
                 tbd_count += 1
+                if self.spill is not None and self.spill.needs_io():
+                    self._spill_io()
         self.logger.info(
-            f"Found {tbd_count} urls to be downloaded from {total_count} "
+            f"Found {tbd_count} urls to be downloaded from {len(self.seen)} "
             f"total urls discovered.")
 
+    def _enqueue(self, url, depth=0, parent=None):
+        if self.spill is not None and (
+                self.spill or self.queued_count >= self.config.queue_memory):
+            # Behind everything spilled already, so the order is kept.
+            self.spill.append(depth, url)
+            return
+        self._push(url, depth, parent)
+
+    def _push(self, url, depth, parent):
+        self.sequence += 1
+        key = self.policy.url_key(url, depth, parent, self.sequence)
+        host = get_host(url)
+        urls = self.to_be_downloaded.get(host)
+        if urls is None:
+            urls = self.to_be_downloaded[host] = list()
+            if host not in self.busy_hosts:
+                heapq.heappush(
+                    self.waiting_hosts, (self.next_fetch.get(host, 0), host))
+        heapq.heappush(urls, (key, url, depth, parent))
+        self.queued_count += 1
+
+    def _refill(self):
+        ''' Moves spilled urls back into memory once the queues are half
+        empty, a segment at a time. '''
+        room = self.config.queue_memory - self.queued_count
+        if not self.spill or room < self.config.queue_memory // 2:
+            return
+        for depth, url in self.spill.pop(room):
+            if (self.resumed_completed and get_fingerprint(get_urlhash(url))
+                    in self.resumed_completed):
+                continue
+            if is_valid(url):
+                self._push(url, depth, None)
+
+    def _spill_io(self, blocking=True):
+        ''' Writes and reads spill segments, see SpillQueue.io. Call without
+        the lock held, so other workers do not wait on the disk. '''
+        if self.spill.io(self.lock, blocking):
+            with self.has_work:
+                self._refill()
+                self.has_work.notify_all()
+
+    def _pop_ready_url(self):
+        ''' Pops a url whose host is out of its politeness window. Returns
+        (url, 0), or (None, delay) when the next host is ready after delay
+        seconds, or (None, None) when nothing is pending. Call with the lock
+        held. '''
+        if self.spill:
+            self._refill()
+        now = time.time()
+        while self.waiting_hosts and self.waiting_hosts[0][0] <= now:
+            ready_time, host = heapq.heappop(self.waiting_hosts)
+            head_key = self.to_be_downloaded[host][0][0]
+            heapq.heappush(
+                self.ready_hosts,
+                (self.policy.host_key(head_key, ready_time), host))
+        if not self.ready_hosts:
+            if not self.waiting_hosts:
+                return None, None
+            return None, self.waiting_hosts[0][0] - now
+        _, host = heapq.heappop(self.ready_hosts)
+        urls = self.to_be_downloaded[host]
+        _, url, depth, _ = heapq.heappop(urls)
+        self.queued_count -= 1
+        if not urls:
+            del self.to_be_downloaded[host]
+        # The host waits for this download to finish before its politeness
+        # window starts, see _release_host.
+        self.busy_hosts.add(host)
+        self.in_flight[url] = depth
+        return url, 0
+
+    def _release_host(self, url):
+        ''' The download of url is over: its host may be fetched again after
+        its politeness delay from now. Returns True when the host has urls
+        waiting for that. Call with the lock held. '''
+        host = get_host(url)
+        if host not in self.busy_hosts:
+            return False
+        self.busy_hosts.discard(host)
+        self.next_fetch[host] = time.time() + self.robots.delay(host)
+        if host not in self.to_be_downloaded:
+            return False
+        heapq.heappush(self.waiting_hosts, (self.next_fetch[host], host))
+        return True
+
+    def is_idle(self):
+        ''' True when nothing is pending, in flight or loading. '''
+        with self.lock:
+            return (
+                not self.to_be_downloaded and not self.spill
+                and not self.in_flight and not self.loading)
+
+    def is_finished(self):
+        ''' True when the crawl is over: this frontier is idle and, in a
+        sharded crawl, so are all the others. '''
+        return self.is_idle() and (
+            self.shard is None or self.shard.is_done())
+
     def get_tbd_url(self):
-        try:
-            return self.to_be_downloaded.pop()
-        except IndexError:
-            return None
+        ''' Returns a url whose host is out of its politeness window,
+        blocking until one is ready. Returns None once the frontier is empty
+        and no other worker can add more urls. '''
+        while True:
+            with self.has_work:
+                if self.closed:
+                    return None
+                url, delay = self._pop_ready_url()
+                if url is not None:
+                    return url
+                if self.spill is None or not self.spill.needs_io():
+                    if delay is None and self.is_finished():
+                        self.has_work.notify_all()
+                        return None
+                    self.has_work.wait(delay)
+                    continue
+            # The next spilled urls are on disk.
+            self._spill_io()
+
+    def poll_tbd_url(self):
+        ''' get_tbd_url without waiting, for callers that wait their own way.
+        Returns (url, 0), or (None, delay) when the next host is ready after
+        delay seconds, or (None, None) when nothing is pending. May read
+        spilled urls from disk first. '''
+        while True:
+            with self.lock:
+                url, delay = self._pop_ready_url()
+                if (url is not None or self.spill is None
+                        or not self.spill.needs_io()):
+                    return url, delay
+            self._spill_io()
+
+    def add_url(self, url, parent=None, depth=None):
+        ''' Returns True if the url was new and is now pending. parent is
+        the url of the page it was found on, None for a seed; urls from
+        another shard come with their depth instead. '''
+        return self.add_urls([url], parent, depth) == 1
+
+    def add_urls(self, urls, parent=None, depth=None):
+        ''' add_url for a batch of urls, usually the links of one page.
+        Returns the number of new urls. Duplicates in the batch are dropped
+        and the urls are hashed before the lock is taken, once, and their
+        records go to the save file in one write. '''
+        depth, batch, _ = self._prepare_urls(urls, parent, depth)
+        with self.has_work:
+            if self.closed:
+                return 0
+            records = self._add_batch(batch, depth, parent)
+            self.save.put_many(records)
+            self.has_work.notify(len(records))
+            spill_io = self.spill is not None and self.spill.needs_io()
+        if spill_io:
+            self._spill_io(blocking=False)
+        return len(records)
+
+    def _prepare_urls(self, urls, parent, depth, completed=False):
+        ''' The discovery depth of the urls, (urlhash, fingerprint, url) for
+        each distinct one this frontier may crawl, and the number of urls
+        forwarded for the first time. The others are forwarded to their
+        shard, completed or not, or dropped by robots.txt. '''
+        if depth is None:
+            depth = (
+                0 if parent is None else self.in_flight.get(parent, 0) + 1)
+        distinct = dict()
+        for url in urls:
+            url = normalize(url)
+            distinct.setdefault(get_urlhash(url), url)
+        batch = list()
+        forwarded = 0
+        for urlhash, url in distinct.items():
+            if self.shard is not None and not self.shard.owns(url):
+                forwarded += self.shard.forward(url, depth, completed)
+            elif self.robots.allowed(url):
+                batch.append((urlhash, get_fingerprint(urlhash), url))
+        return depth, batch, forwarded
+
+    def _add_batch(self, batch, depth, parent):
+        ''' Queues the new urls of a prepared batch and returns their save
+        records. Call with the lock held. '''
+        records = list()
+        for urlhash, fingerprint, url in batch:
+            if not self.seen.add(fingerprint):
+                continue
+            if not self.traps.admit(url):
+                continue
+            records.append((urlhash, url, False, depth))
+            self._enqueue(url, depth, parent)
+        return records
 
-    def add_url(self, url):
-        url = normalize(url)
-        urlhash = get_urlhash(url)
-        if urlhash not in self.save:
-            self.save[urlhash] = (url, False)
-            self.save.sync()
-            self.to_be_downloaded.append(url)
-    
     def mark_url_complete(self, url):
+        self.complete_and_add(url, ())
+
+    def complete_and_add(self, url, links):
+        ''' Marks url complete and adds the links found on it, under one
+        lock acquisition and in one write to the save file, the completion
+        last: a crash never leaves the page completed without its links.
+        Returns the number of new urls, counting the urls forwarded to
+        another shard for the first time, as the trap detector judges the
+        page by them. '''
+        depth, batch, forwarded = self._prepare_urls(links, url, None)
         urlhash = get_urlhash(url)
-        if urlhash not in self.save:
-            # This should not happen.
-            self.logger.error(
-                f"Completed url {url}, but have not seen it before.")
+        # The page's content digest goes out before its completion, so a
+        # completed page is never fetched again without its digest.
+        self.contents.sync()
+        with self.has_work:
+            if self.closed:
+                return 0
+            if get_fingerprint(urlhash) not in self.seen:
+                # This should not happen.
+                self.logger.error(
+                    f"Completed url {url}, but have not seen it before.")
+
+            records = self._add_batch(batch, depth, url)
+            self.save.put_many(records + [(urlhash, url, True, 0)])
+            requeued = (
+                self.in_flight.pop(url, None) is not None
+                and self._release_host(url))
+            self.completed_count += 1
+            if records or requeued:
+                self.has_work.notify(len(records) + requeued)
+            elif (not self.in_flight and not self.to_be_downloaded
+                    and not self.spill):
+                # Wake idle workers so they can see the crawl is over.
+                self.has_work.notify_all()
+            spill_io = self.spill is not None and self.spill.needs_io()
+        if spill_io:
+            self._spill_io(blocking=False)
+        return len(records) + forwarded
+
+    def stop(self):
+        with self.has_work:
+            self.closed = True
+            self.has_work.notify_all()
+
+    def close(self):
+        self.stop()
+        self.save.close()
+        self.robots.close()
+        self.save_near_duplicates()
+        self.contents.close()
+        self.traps.dump()
+
+
+class LogFrontier(Frontier):
+    ''' Frontier backed by the append-only, group-committed LogStore.
+
+    Every CHECKPOINTEVERY completed urls, and on close, the seen set and the
+    pending urls are written to a checkpoint next to the log. Resuming reads
+    the checkpoint and replays only the log records written after it, so
+    startup cost grows with the pending urls, not with every url ever
+    discovered. Pending urls are enqueued by a background thread in chunks,
+    so workers can start on the first chunk right away. '''
+    def _open_save_file(self):
+        self.checkpointing = Lock()
+        # The spill of a crawl resumed with QUEUEMEMORY 0, see
+        # _parse_save_file.
+        self.leftover_spill = None
+        return LogStore(
+            self.config.save_file, self.config.commit_batch,
+            self.config.commit_interval)
+
+    @classmethod
+    def save_file_exists(cls, config):
+        return LogStore.exists(config.save_file)
+
+    def _remove_save_file(self):
+        LogStore.remove(self.config.save_file)
+
+    def _parse_save_file(self):
+        start = time.time()
+        checkpoint = self.save.read_checkpoint()
+        if checkpoint is None:
+            super()._parse_save_file()
+            return
+        offset, slots, seen_count, pending_urls = checkpoint
+        self.seen.load(slots, seen_count)
+        spilled = ()
+        if self.spill is not None:
+            self.spill.resume(offset)
+        elif os.path.isdir(self.spill_dir):
+            # Spilling is off now, but the checkpoint leaves out the urls
+            # spilled before: they are loaded with its pending urls, and
+            # their segments deleted once a checkpoint includes them.
+            self.leftover_spill = SpillQueue(self.spill_dir, 1)
+            if self.leftover_spill.resume(offset):
+                spilled = self.leftover_spill.drain()
+        # Replay the records written after the checkpoint: urls added since
+        # are pending unless completed since, and checkpointed urls that
+        # were completed since must be skipped while loading.
+        added = dict()
+        completed = set()
+        for urlhash, url, is_completed, depth in self.save.records(offset):
+            fingerprint = get_fingerprint(urlhash)
+            self.seen.add(fingerprint)
+            if is_completed:
+                if added.pop(fingerprint, None) is None:
+                    completed.add(fingerprint)
+            else:
+                added[fingerprint] = (depth, url)
+        for depth, url in added.values():
+            if is_valid(url):
+                self._enqueue(url, depth)
+                if self.spill is not None and self.spill.needs_io():
+                    self._spill_io()
+        self.resumed_completed = completed
+        self.loading = True
+        Thread(
+            target=self._load_pending,
+            args=(chain(pending_urls, spilled), completed, start),
+            daemon=True).start()
+        self.logger.info(
+            f"Resumed from checkpoint with {len(added)} urls added since, "
+            f"{len(self.seen)} total urls discovered; loading the rest of the "
+            f"pending urls in the background.")
+
+    def _load_pending(self, pending_urls, completed, start):
+        tbd_count = 0
+        chunk = list()
+        for depth, url in pending_urls:
+            if (completed
+                    and get_fingerprint(get_urlhash(url)) in completed):
+                continue
+            chunk.append((depth, url))
+            if len(chunk) >= self.config.resume_chunk:
+                tbd_count += self._enqueue_chunk(chunk)
+                chunk = list()
+        tbd_count += self._enqueue_chunk(chunk)
+        with self.has_work:
+            self.loading = False
+            self.has_work.notify_all()
+        self.logger.info(
+            f"Loaded {tbd_count} pending urls from checkpoint in "
+            f"{time.time() - start:.3f} seconds.")
+
+    def _enqueue_chunk(self, chunk):
+        valid = [(depth, url) for depth, url in chunk if is_valid(url)]
+        with self.has_work:
+            for depth, url in valid:
+                self._enqueue(url, depth)
+            self.has_work.notify_all()
+        if self.spill is not None:
+            self._spill_io()
+        return len(valid)
+
+    def complete_and_add(self, url, links):
+        added = super().complete_and_add(url, links)
+        with self.lock:
+            due = self.completed_count % self.config.checkpoint_every == 0
+        if due:
+            self.checkpoint(blocking=False)
+        return added
+
+    def checkpoint(self, blocking=True):
+        # Workers skip a periodic checkpoint if another one is being written.
+        if not self.checkpointing.acquire(blocking):
+            return
+        try:
+            with self.lock:
+                if self.loading:
+                    # The pending urls are not all in memory yet; the last
+                    # checkpoint plus the log stay valid until they are.
+                    return
+                self.save.sync()
+                offset = self.save.tell()
+                slots, seen_count = self.seen.dump()
+                pending = [
+                    (depth, url) for url, depth in self.in_flight.items()]
+                for urls in self.to_be_downloaded.values():
+                    pending.extend((depth, url) for _, url, depth, _ in urls)
+                if self.spill is not None:
+                    # The spilled urls stay in their segments.
+                    pending.extend(self.spill.prepare(offset))
+            if self.spill is not None:
+                # Every segment of the prepared range is on disk before the
+                # range is.
+                self._spill_io()
+                self.spill.write_state()
+            self.save.write_checkpoint(offset, slots, seen_count, pending)
+            if self.spill is not None:
+                self.spill.commit()
+            elif self.leftover_spill is not None:
+                shutil.rmtree(self.spill_dir)
+                self.leftover_spill = None
+            self.save_near_duplicates()
+            self.contents.sync()
+            self.traps.dump()
+            for hook in self.checkpoint_hooks:
+                hook()
+        finally:
+            self.checkpointing.release()
 
-        self.save[urlhash] = (url, True)
-        self.save.sync()
+    def close(self):
+        # Stopped first, so nothing is completed after the checkpoint.
+        self.stop()
+        self.checkpoint()
+        super().close()
@@ -0,0 +1,102 @@
+import threading
+
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory, resource_tracker
+
+from requests.models import Response as RawResponse
+from requests.structures import CaseInsensitiveDict
+
+from utils.response import Response
+from crawler.worker import scrape_page
+import scraper
+
+
+class ParsePool(object):
+    ''' Runs crawler.worker.scrape_page in a pool of parser processes, so
+    the links, the summary of the words (their SimHash and counts) and the
+    canonical url of a page all come from there.
+
+    Parsing is CPU bound and holds the GIL, so past a few threads it does
+    not scale inside one process. Each worker thread owns a shared memory
+    buffer; the page body is copied into it once and only its name, length
+    and the small response fields are pickled to the parser process.
+
+    Create it before any thread starts: with the fork start method all
+    parser processes are forked on the first submit, which __init__ does. '''
+    def __init__(self, config):
+        self.executor = ProcessPoolExecutor(
+            config.parse_processes, initializer=_init_parser,
+            initargs=(scraper.PARSER,))
+        self.buffers = threading.local()
+        self.all_buffers = set()
+        self.lock = threading.Lock()
+        # Fork every parser process now, while this is the only thread.
+        self.executor.submit(int).result()
+
+    def _buffer(self, size):
+        buffer = getattr(self.buffers, "shm", None)
+        if buffer is None or buffer.size < size:
+            if buffer is not None:
+                self._release(buffer)
+            # Round up so a thread's buffer is rarely reallocated.
+            buffer = shared_memory.SharedMemory(
+                create=True, size=max(1 << 20, 2 * size))
+            self.buffers.shm = buffer
+            with self.lock:
+                self.all_buffers.add(buffer)
+        return buffer
+
+    def scrape_page(self, url, resp):
+        raw_response = resp.raw_response
+        if (resp.status != 200 or raw_response is None
+                or not raw_response.content):
+            # Nothing to parse; not worth a round trip.
+            return scrape_page(url, resp)
+        content = raw_response.content
+        buffer = self._buffer(len(content))
+        buffer.buf[:len(content)] = content
+        return self.executor.submit(
+            _scrape_shared, buffer.name, len(content), url, resp.url,
+            resp.status, dict(raw_response.headers)).result()
+
+    def _release(self, buffer):
+        with self.lock:
+            self.all_buffers.discard(buffer)
+        buffer.close()
+        buffer.unlink()
+
+    def close(self):
+        self.executor.shutdown()
+        for buffer in list(self.all_buffers):
+            self._release(buffer)
+
+
+# Parser process side: shared memory blocks attached so far, by name.
+_attached = dict()
+
+def _init_parser(parser):
+    scraper.PARSER = parser
+
+def _attach(name):
+    block = _attached.get(name)
+    if block is None:
+        if len(_attached) > 256:
+            # Buffers of threads that grew theirs are gone for good.
+            for old in _attached.values():
+                old.close()
+            _attached.clear()
+        block = _attached[name] = shared_memory.SharedMemory(name=name)
+        # The owning thread unlinks it; without this the resource tracker
+        # would also try to, and warn about a leak.
+        resource_tracker.unregister(block._name, "shared_memory")
+    return block
+
+def _scrape_shared(name, length, url, resp_url, status, headers):
+    raw_response = RawResponse()
+    raw_response.status_code = status
+    raw_response.url = resp_url
+    raw_response.headers = CaseInsensitiveDict(headers)
+    raw_response._content = bytes(_attach(name).buf[:length])
+    resp = Response({"url": resp_url, "status": status})
+    resp.raw_response = raw_response
+    return scrape_page(url, resp)
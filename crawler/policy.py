@@ -0,0 +1,83 @@
+from utils import get_host
+
+
+class QueuePolicy(object):
+    ''' Decides the crawl order of the frontier.
+
+    Every host keeps its pending urls in a heap ordered by url_key, and the
+    hosts that are out of their politeness window wait in a heap ordered by
+    host_key, so both choices are O(log n). Keys end with the sequence
+    number of the url, so ties go to the url discovered first. '''
+    name = None
+
+    def url_key(self, url, depth, parent, sequence):
+        raise NotImplementedError
+
+    def host_key(self, head_key, ready_time):
+        ''' Priority of a ready host from the key of its best url and the
+        time it became ready. '''
+        return head_key
+
+
+class DepthFirst(QueuePolicy):
+    ''' The original order: the last url found on a host is crawled first.
+    Hosts take turns. '''
+    name = "dfs"
+
+    def url_key(self, url, depth, parent, sequence):
+        return -sequence
+
+    def host_key(self, head_key, ready_time):
+        return ready_time
+
+
+class BreadthFirst(QueuePolicy):
+    ''' Shallowest discovery depth first, across all ready hosts. '''
+    name = "bfs"
+
+    def url_key(self, url, depth, parent, sequence):
+        return depth, sequence
+
+
+class RoundRobin(QueuePolicy):
+    ''' Hosts take turns, longest waiting first; every host crawls its urls
+    in the order they were found. '''
+    name = "roundrobin"
+
+    def url_key(self, url, depth, parent, sequence):
+        return sequence
+
+    def host_key(self, head_key, ready_time):
+        return ready_time
+
+
+class BestFirst(QueuePolicy):
+    ''' Lowest score first, across all ready hosts. The score grows with the
+    discovery depth, the number of path segments and a query string; a link
+    to another host than its page gets a bonus, so new subdomains are
+    reached early. '''
+    name = "bestfirst"
+
+    def url_key(self, url, depth, parent, sequence):
+        return score(url, depth, parent), sequence
+
+
+def score(url, depth, parent):
+    path, _, query = url.partition("://")[2].partition("/")[2].partition("?")
+    value = depth + path.count("/") + (1 if path else 0) + (2 if query else 0)
+    if parent is not None and get_host(parent) != get_host(url):
+        value -= 1
+    return value
+
+
+POLICIES = {
+    policy.name: policy
+    for policy in (DepthFirst, BreadthFirst, RoundRobin, BestFirst)}
+
+
+def make_policy(name):
+    if name not in POLICIES:
+        raise ValueError(
+            f"Unknown QUEUEPOLICY {name!r}, expected one of "
+            f"{', '.join(POLICIES)}.")
+    return POLICIES[name]()
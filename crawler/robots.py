@@ -0,0 +1,195 @@
+import re
+import time
+import shelve
+
+from threading import Lock
+from urllib.parse import urlparse
+
+from utils import get_logger, get_host
+from utils.download import download
+
+# How long a robots.txt that could not be fetched (cache server error,
+# timeout, 5xx) is treated as allowing everything before it is retried.
+RETRY_AFTER = 600
+
+
+class RobotsRules(object):
+    ''' The rules of one robots.txt for one user agent, compiled for
+    matching.
+
+    Plain rules ("/people", "/index.php$") go into a character trie, so a
+    path is checked in one walk over its characters however many rules
+    there are. Rules with "*" in the middle are compiled to regexes. As in
+    RFC 9309, the longest matching rule wins and allow wins a tie. '''
+    def __init__(self, rules=(), crawl_delay=None):
+        self.trie = dict()
+        self.wildcards = list()
+        self.crawl_delay = crawl_delay
+        for allow, pattern in rules:
+            self._add(allow, pattern)
+
+    @classmethod
+    def parse(cls, text, user_agent):
+        ''' Rules of the groups for user_agent, or of the "*" groups when no
+        group names it. '''
+        agent = user_agent.lower()
+        groups = list()
+        agents = None
+        for line in text.splitlines():
+            line = line.split("#", 1)[0].strip()
+            field, _, value = line.partition(":")
+            field = field.strip().lower()
+            value = value.strip()
+            if field == "user-agent":
+                if agents is None:
+                    agents = set()
+                    groups.append((agents, list(), list()))
+                agents.add(value.lower())
+            elif field in ("allow", "disallow", "crawl-delay") and groups:
+                # The first rule closes the list of user agents of a group.
+                agents = None
+                _, rules, delays = groups[-1]
+                if field == "crawl-delay":
+                    try:
+                        delays.append(float(value))
+                    except ValueError:
+                        pass
+                elif value:
+                    rules.append((field == "allow", value))
+        matched = [
+            group for group in groups
+            if any(name != "*" and name in agent for name in group[0])]
+        if not matched:
+            matched = [group for group in groups if "*" in group[0]]
+        rules = [rule for _, group_rules, _ in matched for rule in group_rules]
+        delays = [delay for _, _, group_delays in matched
+                  for delay in group_delays]
+        return cls(rules, max(delays) if delays else None)
+
+    def _add(self, allow, pattern):
+        length = len(pattern)
+        anchored = pattern.endswith("$")
+        if anchored:
+            pattern = pattern[:-1]
+        pattern = pattern.rstrip("*")
+        if "*" in pattern:
+            regex = ".*".join(map(re.escape, pattern.split("*")))
+            self.wildcards.append(
+                (re.compile(regex + ("$" if anchored else "")), length, allow))
+            return
+        node = self.trie
+        for char in pattern:
+            node = node.setdefault(char, dict())
+        # "" ends a prefix rule and "$" a rule anchored at the end.
+        key = "$" if anchored else ""
+        node[key] = max(node.get(key, (0, False)), (length, allow))
+
+    def allowed(self, path):
+        best = (0, True)
+        node = self.trie
+        if "" in node:
+            best = max(best, node[""])
+        for char in path:
+            node = node.get(char)
+            if node is None:
+                break
+            if "" in node:
+                best = max(best, node[""])
+        else:
+            if "$" in node:
+                best = max(best, node["$"])
+        for regex, length, allow in self.wildcards:
+            if length > best[0] and regex.match(path):
+                best = max(best, (length, allow))
+        return best[1]
+
+
+ALLOW_ALL = RobotsRules()
+
+
+class Robots(object):
+    ''' robots.txt of every host, fetched once through the cache server.
+
+    fetch() downloads and compiles a host's robots.txt when it is missing or
+    older than ttl; workers call it before downloading a url. allowed() only
+    looks at rules already fetched, so it is cheap enough for add_url, and
+    lets urls of hosts not fetched yet through for the worker to decide.
+    The robots.txt files are kept in a shelve, so a resumed crawl does not
+    fetch them again until they expire. '''
+    def __init__(self, config):
+        self.logger = get_logger("ROBOTS", "FRONTIER")
+        self.config = config
+        self.ttl = config.robots_ttl
+        # host -> (expires, RobotsRules)
+        self.rules = dict()
+        self.lock = Lock()
+        self.host_locks = dict()
+        self.cache = shelve.open(config.robots_file)
+        now = time.time()
+        for host, (expires, status, text) in self.cache.items():
+            if expires > now:
+                self.rules[host] = (expires, self._compile(status, text))
+
+    def _compile(self, status, text):
+        if status != 200:
+            # Missing robots.txt (4xx) or one that could not be fetched.
+            return ALLOW_ALL
+        return RobotsRules.parse(text, self.config.user_agent)
+
+    def allowed(self, url):
+        parsed = urlparse(url)
+        entry = self.rules.get((parsed.hostname or "").lower())
+        if entry is None:
+            return True
+        path = parsed.path or "/"
+        if parsed.params:
+            path = f"{path};{parsed.params}"
+        if parsed.query:
+            path = f"{path}?{parsed.query}"
+        return entry[1].allowed(path)
+
+    def delay(self, host):
+        ''' Seconds between two requests to host: POLITENESS, or the host's
+        Crawl-delay when it asks for more. '''
+        entry = self.rules.get(host)
+        if entry is None or entry[1].crawl_delay is None:
+            return self.config.time_delay
+        return max(self.config.time_delay, entry[1].crawl_delay)
+
+    def needs_fetch(self, url):
+        entry = self.rules.get(get_host(url))
+        return entry is None or entry[0] <= time.time()
+
+    def fetch(self, url, recorder=None):
+        ''' Makes sure the robots.txt of the url's host is known. Returns
+        True if it had to be downloaded. recorder, if any, keeps the
+        response like the pages'. '''
+        if not self.needs_fetch(url):
+            return False
+        host = get_host(url)
+        with self.lock:
+            host_lock = self.host_locks.setdefault(host, Lock())
+        with host_lock:
+            # Another worker may have fetched it meanwhile.
+            if not self.needs_fetch(url):
+                return False
+            parsed = urlparse(url)
+            robots_url = f"{parsed.scheme}://{parsed.netloc}/robots.txt"
+            resp = download(robots_url, self.config, self.logger, recorder)
+            text = ""
+            if resp.status == 200 and resp.raw_response is not None:
+                text = resp.raw_response.content.decode(
+                    "utf-8", errors="replace")
+            ttl = self.ttl if 200 <= resp.status < 500 else RETRY_AFTER
+            expires = time.time() + min(ttl, self.ttl)
+            self.rules[host] = (expires, self._compile(resp.status, text))
+            with self.lock:
+                self.cache[host] = (expires, resp.status, text)
+                self.cache.sync()
+            self.logger.info(
+                f"Fetched {robots_url}, status <{resp.status}>.")
+        return True
+
+    def close(self):
+        with self.lock:
+            self.cache.close()
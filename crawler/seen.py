@@ -0,0 +1,89 @@
+from array import array
+
+
+class FingerprintSet(object):
+    ''' Open addressing hash set of 64-bit url fingerprints.
+
+    Fingerprints live in one flat array of unsigned 64-bit slots with linear
+    probing, so a url costs 8 bytes per slot (16 to 32 bytes at the load
+    factors used here) instead of a python string key. Slot value 0 marks an
+    empty slot, so the fingerprint 0 is stored as 1. '''
+    def __init__(self, capacity=1 << 16, max_load=0.5):
+        self.max_load = max_load
+        size = 1
+        while size * max_load < capacity:
+            size <<= 1
+        self.slots = array("Q", bytes(8 * size))
+        self.mask = size - 1
+        self.count = 0
+
+    def _find(self, fingerprint):
+        ''' Index of the fingerprint, or of the empty slot it would use. '''
+        slots = self.slots
+        mask = self.mask
+        index = fingerprint & mask
+        while True:
+            slot = slots[index]
+            if slot == fingerprint or not slot:
+                return index
+            index = (index + 1) & mask
+
+    def add(self, fingerprint):
+        ''' Adds the fingerprint and returns True if it was not in the set. '''
+        fingerprint = fingerprint or 1
+        slots = self.slots
+        mask = self.mask
+        index = fingerprint & mask
+        while True:
+            slot = slots[index]
+            if slot == fingerprint:
+                return False
+            if not slot:
+                break
+            index = (index + 1) & mask
+        slots[index] = fingerprint
+        self.count += 1
+        if self.count > self.max_load * len(slots):
+            self._grow()
+        return True
+
+    def _grow(self):
+        old_slots = self.slots
+        self.slots = array("Q", bytes(16 * len(old_slots)))
+        self.mask = len(self.slots) - 1
+        for fingerprint in old_slots:
+            if fingerprint:
+                self.slots[self._find(fingerprint)] = fingerprint
+
+    def __contains__(self, fingerprint):
+        fingerprint = fingerprint or 1
+        slots = self.slots
+        mask = self.mask
+        index = fingerprint & mask
+        while True:
+            slot = slots[index]
+            if slot == fingerprint:
+                return True
+            if not slot:
+                return False
+            index = (index + 1) & mask
+
+    def __len__(self):
+        return self.count
+
+    def __iter__(self):
+        return (fingerprint for fingerprint in self.slots if fingerprint)
+
+    def dump(self):
+        ''' A copy of the slot array and the count, for checkpoints. '''
+        return array("Q", self.slots), self.count
+
+    def load(self, slots, count):
+        self.slots = slots
+        self.mask = len(slots) - 1
+        self.count = count
+
+    @property
+    def nbytes(self):
+        return self.slots.itemsize * len(self.slots)
+
@@ -0,0 +1,275 @@
+import os
+import copy
+import time
+import zlib
+import multiprocessing as mp
+
+from collections import Counter
+from queue import Empty
+from threading import Thread, Lock
+
+from utils import get_logger, get_key_host, get_urlhash, get_fingerprint
+from crawler.analytics import CrawlAnalytics, format_report
+from crawler.seen import FingerprintSet
+
+# Per shard slots of the shared counters. EPOCH counts the times the shard
+# left idle.
+SENT, RECEIVED, COMPLETED, IDLE, EPOCH = range(5)
+SLOTS = 5
+# Outboxes are sent at least this often, and the shard's state published.
+FLUSH_INTERVAL = 0.1
+# How often the coordinator looks at the shards.
+POLL_INTERVAL = 0.25
+PROGRESS_EVERY = 30
+
+
+def shard_of(url, count):
+    # By the host of the url's key, so the urls of one page, with or without
+    # "www.", belong to one shard. Stable across processes and runs, unlike
+    # hash().
+    return zlib.crc32(get_key_host(url).encode("utf-8")) % count
+
+
+def shard_path(path, index):
+    ''' frontier.log -> frontier-2.log '''
+    root, extension = os.path.splitext(path)
+    return f"{root}-{index}{extension}"
+
+
+def shard_config(config, index, count):
+    ''' The config of one shard: its own files, and only its own seeds. '''
+    config = copy.copy(config)
+    config.save_file = shard_path(config.save_file, index)
+    config.robots_file = shard_path(config.robots_file, index)
+    config.analytics_file = shard_path(config.analytics_file, index)
+    config.report_file = shard_path(config.report_file, index)
+    if config.archive_dir:
+        config.archive_dir = shard_path(config.archive_dir, index)
+    config.seed_urls = [
+        url for url in config.seed_urls
+        if shard_of(url, count) == index]
+    return config
+
+
+class Shard(object):
+    ''' One process of a sharded crawl.
+
+    The shard owns the hosts that hash to its index, without "www." as in
+    the url keys, so its frontier, save file and politeness cover only
+    those. Its content digests and SimHash fingerprints cover only those
+    too: a page mirrored on hosts of two shards is crawled by both, and
+    counted twice in the report. Links to other hosts are
+    forwarded: Frontier.add_urls hands them to forward(), which collects them
+    per destination and sends them as one batch through the destination's
+    inbox once batch_size are waiting, or after FLUSH_INTERVAL. A receiver
+    thread adds the batches from this shard's inbox to its frontier.
+
+    Its sent, received and completed counts, whether it is idle and its
+    epoch are published to shared counters for the Coordinator, which sets
+    done once the whole crawl is over; until then an idle shard waits for
+    urls instead of stopping. An idle shard only gets work from a received
+    batch: the receiver clears IDLE and bumps EPOCH under the frontier lock
+    before adding it, and counts it RECEIVED only once it is in the
+    frontier. IDLE is set again under the same lock, only when the frontier
+    is idle, no batch is being added and nothing waits to be sent, so it is
+    never set while the shard has work. '''
+    def __init__(self, index, count, inboxes, counters, done, batch_size):
+        self.index = index
+        self.count = count
+        self.inboxes = inboxes
+        self.counters = counters
+        self.done = done
+        self.batch_size = batch_size
+        self.outboxes = [dict() for _ in range(count)]
+        self.lock = Lock()
+        self.frontier = None
+        # Set while a received batch is being added to the frontier.
+        self.receiving = False
+        # Fingerprints of the urls forwarded so far: each goes once per run.
+        self.forwarded = FingerprintSet()
+
+    def _counter(self, slot):
+        return self.index * SLOTS + slot
+
+    def owns(self, url):
+        return shard_of(url, self.count) == self.index
+
+    def forward(self, url, depth, completed=False):
+        ''' Returns True when the url was not forwarded before, so it counts
+        as a new url of the page it was found on. completed urls are marked
+        completed by their shard instead of queued, see
+        Frontier.add_completed. '''
+        target = shard_of(url, self.count)
+        fingerprint = get_fingerprint(get_urlhash(url))
+        with self.lock:
+            if not self.forwarded.add(fingerprint):
+                return False
+            outbox = self.outboxes[target]
+            outbox[url] = (depth, completed)
+            if len(outbox) >= self.batch_size:
+                self.outboxes[target] = dict()
+                self._send(target, outbox)
+            return True
+
+    def _send(self, target, outbox):
+        # Counted before it is sent, so the coordinator never sees a batch
+        # received but not sent. Call with the lock held.
+        self.counters[self._counter(SENT)] += len(outbox)
+        self.inboxes[target].put([
+            (url, depth, completed)
+            for url, (depth, completed) in outbox.items()])
+
+    def flush(self):
+        with self.lock:
+            for target, outbox in enumerate(self.outboxes):
+                if outbox:
+                    self.outboxes[target] = dict()
+                    self._send(target, outbox)
+
+    def is_done(self):
+        return self.done.is_set()
+
+    def start(self, frontier):
+        self.frontier = frontier
+        Thread(target=self._receive, daemon=True).start()
+        Thread(target=self._publish, daemon=True).start()
+
+    def _receive(self):
+        inbox = self.inboxes[self.index]
+        while not self.done.is_set():
+            try:
+                batch = inbox.get(timeout=FLUSH_INTERVAL)
+            except Empty:
+                continue
+            by_depth = dict()
+            completed = list()
+            for url, depth, is_completed in batch:
+                if is_completed:
+                    completed.append(url)
+                else:
+                    by_depth.setdefault(depth, list()).append(url)
+            with self.frontier.lock:
+                self.receiving = True
+                self.counters[self._counter(IDLE)] = 0
+                self.counters[self._counter(EPOCH)] += 1
+            for depth, urls in by_depth.items():
+                self.frontier.add_urls(urls, depth=depth)
+            if completed:
+                self.frontier.add_completed(completed)
+            with self.frontier.lock:
+                self.counters[self._counter(RECEIVED)] += len(batch)
+                self.receiving = False
+
+    def _publish(self):
+        while not self.done.is_set():
+            time.sleep(FLUSH_INTERVAL)
+            self.flush()
+            with self.frontier.lock:
+                # Urls are only forwarded while the frontier is not idle, so
+                # the outboxes stay empty until it leaves idle.
+                with self.lock:
+                    idle = (
+                        self.frontier.is_idle() and not self.receiving
+                        and not any(self.outboxes))
+                self.counters[self._counter(IDLE)] = int(idle)
+                self.counters[self._counter(COMPLETED)] = (
+                    self.frontier.completed_count)
+        # Wake the workers waiting for urls, so they see the crawl is over.
+        with self.frontier.has_work:
+            self.frontier.has_work.notify_all()
+
+
+class Coordinator(object):
+    ''' Starts the shard processes and decides when the crawl is over.
+
+    The crawl is over when every shard is idle and every forwarded url was
+    received, and nothing changed between two looks at the counters. The
+    counters other than IDLE only grow, so each one stayed the same between
+    the two looks: at any moment in between, every shard was idle, as
+    leaving idle bumps its EPOCH, and no batch was on its way or being
+    added, as those are counted sent but not yet received. '''
+    def __init__(self, config, run_shard):
+        self.logger = get_logger("SHARDS", "CRAWLER")
+        self.config = config
+        self.count = config.shards
+        self.run_shard = run_shard
+        self.inboxes = [mp.Queue() for _ in range(self.count)]
+        self.counters = mp.RawArray("q", SLOTS * self.count)
+        self.done = mp.Event()
+
+    def _start_shard(self, index, restart):
+        shard = Shard(
+            index, self.count, self.inboxes, self.counters, self.done,
+            self.config.shard_batch)
+        self.run_shard(
+            shard_config(self.config, index, self.count), shard, restart)
+
+    def _snapshot(self):
+        counters = list(self.counters)
+        return [counters[index * SLOTS:(index + 1) * SLOTS]
+                for index in range(self.count)]
+
+    def _is_over(self, snapshot):
+        return (
+            all(shard[IDLE] for shard in snapshot)
+            and sum(shard[SENT] for shard in snapshot)
+            == sum(shard[RECEIVED] for shard in snapshot))
+
+    def run(self, restart):
+        processes = [
+            mp.Process(
+                target=self._start_shard, args=(index, restart),
+                name=f"shard-{index}")
+            for index in range(self.count)]
+        for process in processes:
+            process.start()
+        start = last_progress = time.time()
+        previous = None
+        while not self.done.is_set():
+            time.sleep(POLL_INTERVAL)
+            snapshot = self._snapshot()
+            if snapshot == previous and self._is_over(snapshot):
+                self.done.set()
+            previous = snapshot
+            failed = [
+                process.name for process in processes
+                if process.exitcode not in (None, 0)]
+            if failed:
+                self.logger.error(
+                    f"{', '.join(failed)} failed, stopping the crawl.")
+                self.done.set()
+            if time.time() - last_progress >= PROGRESS_EVERY:
+                last_progress = time.time()
+                self._log_progress(snapshot, last_progress - start)
+        for process in processes:
+            process.join()
+        self._log_progress(self._snapshot(), time.time() - start)
+
+    def _log_progress(self, snapshot, elapsed):
+        pages = [shard[COMPLETED] for shard in snapshot]
+        forwarded = sum(shard[SENT] for shard in snapshot)
+        self.logger.info(
+            f"{sum(pages)} pages in {elapsed:.0f}s "
+            f"({sum(pages) / max(elapsed, 1e-9):.1f} pages/s), per shard "
+            f"{pages}; {forwarded} links forwarded between shards.")
+
+    def write_report(self, top=50):
+        ''' The crawl report over the analytics of every shard. Hosts are
+        split between the shards, so their counts add up. '''
+        page_count = 0
+        longest = (0, None)
+        words = Counter()
+        subdomains = Counter()
+        for index in range(self.count):
+            analytics = CrawlAnalytics(
+                shard_path(self.config.analytics_file, index), False,
+                readonly=True)
+            page_count += len(analytics.pages)
+            longest = max(longest, analytics.longest)
+            words.update(analytics.words)
+            subdomains.update(analytics.subdomains)
+        with open(self.config.report_file, "w") as report:
+            report.write(format_report(
+                page_count, longest, words, subdomains, top))
+        self.logger.info(
+            f"Wrote the crawl report to {self.config.report_file}.")
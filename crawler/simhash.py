@@ -0,0 +1,163 @@
+import os
+import struct
+
+from array import array
+from collections import Counter
+from functools import lru_cache
+from hashlib import blake2b
+from threading import Lock
+
+# Every byte value with each of its 8 bits spread to its own 32 bit lane, so
+# the votes of many features for the 8 bits of a byte are one sum of ints.
+LANE = 32
+LANE_MASK = (1 << LANE) - 1
+_SPREAD_BYTE = [
+    sum(1 << (LANE * bit) for bit in range(8) if byte >> bit & 1)
+    for byte in range(256)]
+# Features are runs of this many words, so the order of words counts and
+# frequent words alone do not make pages look alike.
+SHINGLE = 3
+# Pages with fewer words are too small to tell apart by their text.
+MIN_WORDS = 50
+# A dump is this header followed by the fingerprint array, the key array,
+# the heads and the chains of every band:
+#   distance | bucket bits | number of fingerprints
+INDEX_HEADER = struct.Struct("<QQQ")
+
+
+@lru_cache(maxsize=1 << 16)
+def _digest(shingle):
+    return blake2b(shingle.encode("utf-8"), digest_size=8).digest()
+
+
+def shingles(tokens):
+    if len(tokens) <= SHINGLE:
+        return [" ".join(tokens)]
+    return list(map(
+        " ".join, zip(*(tokens[start:] for start in range(SHINGLE)))))
+
+
+def simhash(tokens):
+    ''' 64 bit SimHash of a page's words. Pages that share most of their
+    word shingles get fingerprints a few bits apart; pages that only share
+    a template and common words do not. '''
+    features = shingles(tokens)
+    digests = b"".join(map(_digest, features))
+    fingerprint = 0
+    for byte in range(8):
+        # How many features have each value at this byte of their hash.
+        votes = 0
+        for value, count in Counter(digests[byte::8]).items():
+            votes += count * _SPREAD_BYTE[value]
+        for bit in range(8):
+            if 2 * (votes >> (LANE * bit) & LANE_MASK) > len(features):
+                fingerprint |= 1 << (8 * byte + bit)
+    return fingerprint
+
+
+def hamming(a, b):
+    return bin(a ^ b).count("1")
+
+
+class SimHashIndex(object):
+    ''' Banded LSH index of SimHash fingerprints.
+
+    The 64 bits are cut into distance + 1 bands. Two fingerprints at most
+    distance bits apart agree exactly on at least one band, so looking up a
+    fingerprint's bucket in every band finds all its near duplicates. Every
+    band is a chained hash table kept in flat arrays: 8 bytes per
+    fingerprint plus 4 per band, and 4 per bucket. Each fingerprint is
+    stored with the key of its page, 8 more bytes, so a page fetched again
+    after a restart does not match itself. '''
+    def __init__(self, distance=3, bucket_bits=16):
+        self.distance = distance
+        self.bucket_bits = bucket_bits
+        bands = distance + 1
+        self.bands = [
+            (64 * band // bands, 64 * (band + 1) // bands - 64 * band // bands)
+            for band in range(bands)]
+        self.fingerprints = array("Q")
+        self.keys = array("Q")
+        self.heads = [array("i", [-1]) * (1 << bucket_bits) for _ in self.bands]
+        self.chains = [array("i") for _ in self.bands]
+        self.lock = Lock()
+
+    def __len__(self):
+        return len(self.fingerprints)
+
+    @property
+    def nbytes(self):
+        arrays = [self.fingerprints, self.keys] + self.heads + self.chains
+        return sum(len(values) * values.itemsize for values in arrays)
+
+    def _buckets(self, fingerprint):
+        mask = (1 << self.bucket_bits) - 1
+        for shift, width in self.bands:
+            # Bands wider than the table share buckets; the chain walk
+            # compares whole fingerprints anyway.
+            yield (fingerprint >> shift & ((1 << width) - 1)) & mask
+
+    def find(self, fingerprint, key):
+        ''' A fingerprint of another page than key at most distance bits
+        away, or None. '''
+        fingerprints = self.fingerprints
+        keys = self.keys
+        for band, bucket in enumerate(self._buckets(fingerprint)):
+            chain = self.chains[band]
+            index = self.heads[band][bucket]
+            while index >= 0:
+                if (keys[index] != key and hamming(
+                        fingerprints[index], fingerprint) <= self.distance):
+                    return fingerprints[index]
+                index = chain[index]
+        return None
+
+    def add(self, fingerprint, key):
+        index = len(self.fingerprints)
+        self.fingerprints.append(fingerprint)
+        self.keys.append(key)
+        for band, bucket in enumerate(self._buckets(fingerprint)):
+            self.chains[band].append(self.heads[band][bucket])
+            self.heads[band][bucket] = index
+
+    def check_and_add(self, fingerprint, key):
+        ''' Returns the near duplicate of fingerprint already stored for
+        another page, or stores fingerprint as the page key's and returns
+        None. key is a 64 bit id of the page, such as its url
+        fingerprint. '''
+        with self.lock:
+            match = self.find(fingerprint, key)
+            if match is None:
+                self.add(fingerprint, key)
+            return match
+
+    def dump(self, path):
+        with self.lock:
+            with open(f"{path}.tmp", "wb") as out:
+                out.write(INDEX_HEADER.pack(
+                    self.distance, self.bucket_bits, len(self.fingerprints)))
+                self.fingerprints.tofile(out)
+                self.keys.tofile(out)
+                for heads, chain in zip(self.heads, self.chains):
+                    heads.tofile(out)
+                    chain.tofile(out)
+            os.replace(f"{path}.tmp", path)
+
+    @classmethod
+    def load(cls, path):
+        ''' Raises ValueError when the file is not a whole dump. '''
+        with open(path, "rb") as dump:
+            distance, bucket_bits, count = INDEX_HEADER.unpack(
+                dump.read(INDEX_HEADER.size))
+            index = cls(distance, bucket_bits)
+            size = INDEX_HEADER.size + 16 * count + len(index.bands) * 4 * (
+                (1 << bucket_bits) + count)
+            if os.path.getsize(path) != size:
+                raise ValueError(f"{path} is not a SimHash index dump.")
+            index.fingerprints.fromfile(dump, count)
+            index.keys.fromfile(dump, count)
+            for band in range(len(index.bands)):
+                index.heads[band] = array("i")
+                index.heads[band].fromfile(dump, 1 << bucket_bits)
+                index.chains[band].fromfile(dump, count)
+        return index
@@ -0,0 +1,246 @@
+import os
+import shutil
+import struct
+import zlib
+
+from collections import deque
+from threading import Lock
+
+from utils import get_logger
+
+# A segment file is this header followed by its zlib compressed records:
+#   number of urls
+SEGMENT_HEADER = struct.Struct("<I")
+# Every record is this header followed by the utf-8 url:
+#   discovery depth | url length
+SPILL_RECORD = struct.Struct("<BI")
+# The state file holds up to two of these, the range of segments [head, tail)
+# that goes with the checkpoint at log offset:
+#   log offset | head | tail
+STATE = struct.Struct("<QQQ")
+STATE_FILE = "state"
+MAX_DEPTH = 255
+
+
+def segment_path(directory, number):
+    return os.path.join(directory, f"segment-{number:08d}.spill")
+
+
+def encode_segment(entries):
+    records = b"".join(
+        SPILL_RECORD.pack(min(depth, MAX_DEPTH), len(url)) + url
+        for depth, url in (
+            (depth, url.encode("utf-8")) for depth, url in entries))
+    return SEGMENT_HEADER.pack(len(entries)) + zlib.compress(records, 1)
+
+
+def decode_segment(data):
+    records = zlib.decompress(data[SEGMENT_HEADER.size:])
+    entries = list()
+    offset = 0
+    while offset < len(records):
+        depth, length = SPILL_RECORD.unpack_from(records, offset)
+        offset += SPILL_RECORD.size
+        url = records[offset:offset + length].decode("utf-8")
+        entries.append((depth, url))
+        offset += length
+    return entries
+
+
+class SpillQueue(object):
+    ''' FIFO of (depth, url) kept on disk, for the pending urls that do not
+    fit in the frontier's memory budget.
+
+    Appended urls collect in a tail buffer that is sealed as one segment
+    every segment_size urls; pop() takes whole segments from the head. The
+    queue is guarded by the frontier's lock, and those methods never touch
+    the disk: io() compresses and writes the sealed segments and reads the
+    next one ahead, taking the lock only to swap buffers, so workers do not
+    wait on the disk. Only the buffers and a few segments are in memory.
+
+    Checkpoints of the frontier leave the spilled urls out. Before a
+    checkpoint, prepare() records the range of segments [head, tail) that
+    goes with it and write_state() saves it once io() wrote them, and after
+    it commit() deletes the segments before the range. resume() keeps the
+    range of the checkpoint being resumed: the segments before it are in
+    the checkpoint, the ones after it are replayed from the log. '''
+    def __init__(self, directory, segment_size):
+        self.logger = get_logger("SPILL", "FRONTIER")
+        self.directory = directory
+        self.segment_size = segment_size
+        # Held for the disk I/O, without the frontier's lock.
+        self.io_lock = Lock()
+        os.makedirs(directory, exist_ok=True)
+        self._reset()
+
+    def _reset(self):
+        self.head = self.tail = self.count = 0
+        self.committed = None
+        self.prepared = None
+        self.head_buffer = deque()
+        self.tail_buffer = list()
+        # Sealed segments not written yet, and the head segment read ahead,
+        # by number.
+        self.unwritten = dict()
+        self.loaded = dict()
+
+    def _segments(self):
+        return sorted(
+            int(name[8:16]) for name in os.listdir(self.directory)
+            if name.startswith("segment-"))
+
+    def resume(self, offset):
+        ''' Loads the segments of the checkpoint at log offset. Returns
+        False, and empties the queue, when there are none. '''
+        path = os.path.join(self.directory, STATE_FILE)
+        ranges = list()
+        if os.path.exists(path):
+            with open(path, "rb") as state:
+                data = state.read()
+            ranges = list(STATE.iter_unpack(
+                data[:len(data) - len(data) % STATE.size]))
+        match = [entry for entry in ranges if entry[0] == offset]
+        if not match:
+            self.clear()
+            return False
+        self.committed = match[-1]
+        _, self.head, self.tail = self.committed
+        for number in self._segments():
+            if not self.head <= number < self.tail:
+                os.remove(segment_path(self.directory, number))
+                continue
+            with open(segment_path(self.directory, number), "rb") as segment:
+                self.count += SEGMENT_HEADER.unpack(
+                    segment.read(SEGMENT_HEADER.size))[0]
+        self.logger.info(
+            f"Resumed {self.count} spilled urls from {self.directory}.")
+        return True
+
+    def drain(self):
+        ''' Yields the urls of the resumed segments, oldest first, reading
+        them from disk one at a time; for a frontier that no longer spills.
+        Leaves the queue and its files as they are. '''
+        for number in range(self.head, self.tail):
+            with open(segment_path(self.directory, number), "rb") as segment:
+                yield from decode_segment(segment.read())
+
+    def __len__(self):
+        return self.count
+
+    def append(self, depth, url):
+        self.tail_buffer.append((depth, url))
+        self.count += 1
+        if len(self.tail_buffer) >= self.segment_size:
+            self.seal()
+
+    def seal(self):
+        ''' Makes the tail buffer a new segment, for io() to write. '''
+        if not self.tail_buffer:
+            return
+        self.unwritten[self.tail] = self.tail_buffer
+        self.tail += 1
+        self.tail_buffer = list()
+
+    def pop(self, count):
+        ''' Up to count (depth, url) from the head, oldest first. Stops
+        early at a segment that io() has not read ahead yet. '''
+        entries = list()
+        count = min(count, self.count)
+        while len(entries) < count:
+            if not self.head_buffer:
+                if self.head < self.tail:
+                    # Still written by io() when it is in unwritten, for a
+                    # checkpoint whose range includes it.
+                    segment = self.unwritten.get(self.head)
+                    if segment is None:
+                        segment = self.loaded.pop(self.head, None)
+                    if segment is None:
+                        break
+                    self.head_buffer.extend(segment)
+                    self.head += 1
+                else:
+                    self.head_buffer.extend(self.tail_buffer)
+                    self.tail_buffer = list()
+            while self.head_buffer and len(entries) < count:
+                entries.append(self.head_buffer.popleft())
+        self.count -= len(entries)
+        return entries
+
+    def _next_to_load(self):
+        if (self.head < self.tail and self.head not in self.unwritten
+                and self.head not in self.loaded):
+            return self.head
+        return None
+
+    def needs_io(self):
+        return bool(self.unwritten) or self._next_to_load() is not None
+
+    def io(self, lock, blocking=True):
+        ''' Writes the sealed segments and reads the head segment ahead.
+        lock is the frontier's lock that guards the queue; call without
+        holding it. Returns True when a segment was read, False when there
+        was nothing to read or, without blocking, another thread is doing
+        the I/O. '''
+        if not self.io_lock.acquire(blocking):
+            return False
+        try:
+            with lock:
+                writes = list(self.unwritten.items())
+                number = self._next_to_load()
+            for segment_number, entries in writes:
+                with open(segment_path(self.directory, segment_number),
+                          "wb") as segment:
+                    segment.write(encode_segment(entries))
+                    segment.flush()
+                    os.fsync(segment.fileno())
+            entries = None
+            if number is not None:
+                with open(segment_path(self.directory, number), "rb") as segment:
+                    entries = decode_segment(segment.read())
+            with lock:
+                for segment_number, _ in writes:
+                    del self.unwritten[segment_number]
+                if entries is not None:
+                    self.loaded[number] = entries
+            return entries is not None
+        finally:
+            self.io_lock.release()
+
+    def prepare(self, offset):
+        ''' Seals the tail and records [head, tail) for the checkpoint at log
+        offset. Returns the urls taken from segments but not popped yet,
+        which the checkpoint must include. Call with the frontier's lock
+        held, then io() and write_state(). '''
+        self.seal()
+        self.prepared = (offset, self.head, self.tail)
+        return list(self.head_buffer)
+
+    def write_state(self):
+        ''' Saves the prepared range, keeping the range of the last committed
+        checkpoint in case this one is never written. '''
+        ranges = [self.prepared]
+        if self.committed is not None:
+            ranges.insert(0, self.committed)
+        tmp_path = os.path.join(self.directory, f"{STATE_FILE}.tmp")
+        with open(tmp_path, "wb") as state:
+            state.write(b"".join(STATE.pack(*entry) for entry in ranges))
+            state.flush()
+            os.fsync(state.fileno())
+        os.replace(tmp_path, os.path.join(self.directory, STATE_FILE))
+
+    def commit(self):
+        ''' The checkpoint of the last prepare() is written: deletes the
+        segments before its range. '''
+        if self.prepared is None:
+            return
+        with self.io_lock:
+            for number in self._segments():
+                if number >= self.prepared[1]:
+                    break
+                os.remove(segment_path(self.directory, number))
+        self.committed, self.prepared = self.prepared, None
+
+    def clear(self):
+        shutil.rmtree(self.directory)
+        os.makedirs(self.directory)
+        self._reset()
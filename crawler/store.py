@@ -0,0 +1,260 @@
+import os
+import dbm
+import shelve
+import struct
+import zlib
+
+from array import array
+from threading import Thread, Lock, Event
+
+from utils import get_logger
+
+# Every log record is a fixed header followed by the utf-8 url:
+#   crc32 | flags | sha256 urlhash (raw bytes) | url length
+# The lowest bit of flags is set for a completed url, the other bits hold
+# its discovery depth, up to MAX_DEPTH.
+# The crc covers everything after itself, so a torn or corrupted tail is
+# detected on replay.
+RECORD_HEADER = struct.Struct("<IB32sI")
+# A checkpoint is this header, the raw slot array of the seen set, then one
+# pending url per line:
+#   log offset | number of slots | number of fingerprints | number of urls
+# Each line is the depth of the url, a space and the url.
+CHECKPOINT_HEADER = struct.Struct("<QQQQ")
+MAX_DEPTH = 127
+
+
+class ShelveStore(object):
+    ''' The original save file: one dbm write and one sync per record. '''
+    # The dbm modules add these to the path, depending on which one is used.
+    SUFFIXES = ("", ".db", ".dat", ".dir", ".bak", ".pag")
+
+    def __init__(self, path):
+        self.save = shelve.open(path)
+
+    @staticmethod
+    def exists(path):
+        return dbm.whichdb(path) is not None
+
+    @classmethod
+    def remove(cls, path):
+        for suffix in cls.SUFFIXES:
+            if os.path.exists(f"{path}{suffix}"):
+                os.remove(f"{path}{suffix}")
+
+    def records(self):
+        for urlhash, (url, completed, *depth) in self.save.items():
+            # Save files from before depths were kept have none.
+            yield urlhash, url, completed, depth[0] if depth else 0
+
+    def put(self, urlhash, url, completed, depth=0):
+        self.put_many([(urlhash, url, completed, depth)])
+
+    def put_many(self, records):
+        ''' Writes (urlhash, url, completed, depth) records, synced once. '''
+        for urlhash, url, completed, depth in records:
+            self.save[urlhash] = (url, completed, depth)
+        self.save.sync()
+
+    def sync(self):
+        self.save.sync()
+
+    def close(self):
+        self.save.close()
+
+
+class LogStore(object):
+    ''' Append-only save file with group commit.
+
+    put() only buffers the record, and put_many() its records in one go,
+    so they are committed together. A background thread writes and fsyncs
+    the buffer every commit_interval seconds, or as soon as commit_batch
+    records are waiting, so workers never wait on the disk. A crash can lose
+    at most the last uncommitted batch; records() drops a torn tail. '''
+    def __init__(self, path, commit_batch=512, commit_interval=0.2):
+        self.logger = get_logger("STORE", "FRONTIER")
+        self.path = path
+        self.commit_batch = commit_batch
+        self.commit_interval = commit_interval
+        self.checkpoint_path = f"{path}.checkpoint"
+        if (not os.path.exists(self.path)
+                and os.path.exists(self.checkpoint_path)):
+            # Left over from a save file that was deleted on restart.
+            os.remove(self.checkpoint_path)
+        self.buffer = list()
+        self.lock = Lock()
+        self.io_lock = Lock()
+        # Opened on the first commit, after records() had a chance to
+        # truncate a torn tail.
+        self.file = None
+        self.wakeup = Event()
+        self.closed = False
+        self.flusher = Thread(target=self._flush_loop, daemon=True)
+        self.flusher.start()
+
+    @staticmethod
+    def exists(path):
+        return os.path.exists(path)
+
+    @staticmethod
+    def remove(path):
+        # The checkpoint goes when the store is opened without its log.
+        os.remove(path)
+
+    def records(self, offset=0):
+        ''' Replays the log in order, from offset on. A url appears once
+        when it is added and again when it is completed; the last record
+        wins. Records are (urlhash, url, completed, depth). '''
+        if not os.path.exists(self.path):
+            return
+        size = os.path.getsize(self.path)
+        valid_size = offset
+        for urlhash, url, completed, depth, end in read_records(
+                self.path, offset):
+            yield urlhash, url, completed, depth
+            valid_size = end
+        if valid_size < size and self.file is None:
+            self.logger.warning(
+                f"Dropping {size - valid_size} bytes of torn or corrupt "
+                f"records at the end of {self.path}.")
+            with open(self.path, "r+b") as save:
+                save.truncate(valid_size)
+
+    def put(self, urlhash, url, completed, depth=0):
+        self.put_many([(urlhash, url, completed, depth)])
+
+    def put_many(self, records):
+        records = [encode_record(*record) for record in records]
+        with self.lock:
+            self.buffer.extend(records)
+            if len(self.buffer) >= self.commit_batch:
+                self.wakeup.set()
+
+    def sync(self):
+        with self.io_lock:
+            with self.lock:
+                records, self.buffer = self.buffer, list()
+            if not records:
+                return
+            if self.file is None:
+                self.file = open(self.path, "ab")
+            self.file.write(b"".join(records))
+            self.file.flush()
+            os.fsync(self.file.fileno())
+
+    def tell(self):
+        ''' Size of the committed log. Call sync() first. '''
+        with self.io_lock:
+            if self.file is not None:
+                return self.file.tell()
+        return os.path.getsize(self.path) if os.path.exists(self.path) else 0
+
+    def write_checkpoint(self, offset, slots, seen_count, pending_urls):
+        tmp_path = f"{self.checkpoint_path}.tmp"
+        with open(tmp_path, "wb") as out:
+            out.write(CHECKPOINT_HEADER.pack(
+                offset, len(slots), seen_count, len(pending_urls)))
+            slots.tofile(out)
+            out.write(b"".join(
+                f"{depth} {url}\n".encode("utf-8")
+                for depth, url in pending_urls))
+            out.flush()
+            os.fsync(out.fileno())
+        os.replace(tmp_path, self.checkpoint_path)
+
+    def read_checkpoint(self):
+        ''' Returns (log offset, seen slots, seen count, pending urls), where
+        pending urls is a lazy iterator of (depth, url), or None without a
+        usable checkpoint. '''
+        if not os.path.exists(self.checkpoint_path):
+            return None
+        with open(self.checkpoint_path, "rb") as checkpoint:
+            offset, slot_count, seen_count, url_count = (
+                CHECKPOINT_HEADER.unpack(
+                    checkpoint.read(CHECKPOINT_HEADER.size)))
+            slots = array("Q")
+            slots.fromfile(checkpoint, slot_count)
+            urls_offset = checkpoint.tell()
+        if offset > os.path.getsize(self.path):
+            self.logger.warning(
+                f"Ignoring checkpoint {self.checkpoint_path}, it is ahead of "
+                f"the log.")
+            return None
+        return offset, slots, seen_count, read_pending(
+            self.checkpoint_path, urls_offset)
+
+    def _flush_loop(self):
+        while not self.closed:
+            self.wakeup.wait(self.commit_interval)
+            self.wakeup.clear()
+            self.sync()
+
+    def close(self):
+        self.closed = True
+        self.wakeup.set()
+        self.flusher.join()
+        self.sync()
+        if self.file is not None:
+            self.file.close()
+
+
+def encode_record(urlhash, url, completed, depth=0):
+    url = url.encode("utf-8")
+    flags = min(depth, MAX_DEPTH) << 1 | completed
+    body = RECORD_HEADER.pack(
+        0, flags, bytes.fromhex(urlhash), len(url))[4:] + url
+    return struct.pack("<I", zlib.crc32(body)) + body
+
+
+def read_records(path, offset=0):
+    ''' Yields (urlhash, url, completed, depth, end_offset) for every intact
+    record
+    from offset on, stopping at the first torn or corrupt one. '''
+    with open(path, "rb") as save:
+        save.seek(offset)
+        while True:
+            header = save.read(RECORD_HEADER.size)
+            if len(header) < RECORD_HEADER.size:
+                return
+            crc, flags, digest, length = RECORD_HEADER.unpack(header)
+            url = save.read(length)
+            if (len(url) < length
+                    or zlib.crc32(header[4:] + url) != crc):
+                return
+            offset += RECORD_HEADER.size + length
+            yield (
+                digest.hex(), url.decode("utf-8"), bool(flags & 1),
+                flags >> 1, offset)
+
+
+def read_pending(path, offset):
+    with open(path, "rb") as lines:
+        lines.seek(offset)
+        for line in lines:
+            depth, _, url = line.rstrip(b"\n").decode("utf-8").partition(" ")
+            if not depth.isdigit():
+                # A checkpoint from before depths were kept.
+                yield 0, depth
+                continue
+            yield int(depth), url
+
+
+def compact(path):
+    ''' Rewrites the log keeping only the latest record of every url.
+    Must not run while a crawler has the save file open. The checkpoint
+    refers to offsets in the old log, so it is removed. '''
+    entries = dict()
+    for urlhash, url, completed, depth, _ in read_records(path):
+        entries[urlhash] = (url, completed, depth)
+    tmp_path = f"{path}.compact"
+    with open(tmp_path, "wb") as out:
+        for urlhash, (url, completed, depth) in entries.items():
+            out.write(encode_record(urlhash, url, completed, depth))
+        out.flush()
+        os.fsync(out.fileno())
+    before = os.path.getsize(path)
+    if os.path.exists(f"{path}.checkpoint"):
+        os.remove(f"{path}.checkpoint")
+    os.replace(tmp_path, path)
+    return before, os.path.getsize(path), len(entries)
+
@@ -0,0 +1,135 @@
+import os
+import re
+import json
+
+from threading import Lock
+from urllib.parse import urlparse, parse_qsl
+
+from utils import get_logger
+
+DIGITS = re.compile(r"\d+")
+# Session ids, hashes and the like.
+LONG_ID = re.compile(r"^[0-9a-f]{16,}$|^(?=[a-z_-]*\d)[0-9a-z_-]{24,}$")
+
+
+def url_template(url):
+    ''' host, path shape and query keys of a url. Numbers in the path become
+    {n} and long ids {id}, so the pages of a calendar, of a paginated list
+    or of a session id trap share one template. '''
+    parsed = urlparse(url)
+    segments = list()
+    for segment in parsed.path.lower().split("/"):
+        if LONG_ID.match(segment):
+            segments.append("{id}")
+        else:
+            segments.append(DIGITS.sub("{n}", segment))
+    keys = sorted({key for key, _ in parse_qsl(
+        parsed.query, keep_blank_values=True)})
+    template = f"{(parsed.hostname or '').lower()}{'/'.join(segments)}"
+    return f"{template}?{'&'.join(keys)}" if keys else template
+
+
+def has_repeated_segments(url):
+    ''' /news/news/... or /a/b/a/b/a/...: relative links resolved against
+    the wrong base keep adding the same directories. Numbers are left out,
+    as in dates like /2021/01/01/; calendar traps are caught by their
+    template. '''
+    segments = [
+        segment for segment in urlparse(url).path.split("/") if segment]
+    for previous, segment in zip(segments, segments[1:]):
+        if previous == segment and not segment.isdigit():
+            return True
+    return any(
+        segments.count(segment) > 2 for segment in set(segments)
+        if not segment.isdigit())
+
+
+class TrapDetector(object):
+    ''' Online crawler trap detection by url template.
+
+    Every new url is counted against its template (see url_template). A
+    template is cut off, and its urls are no longer added or downloaded,
+    once budget urls of it were added, or once min_pages of its pages were
+    crawled and they added fewer than min_novelty new urls per page on
+    average. The state is saved next to the save file and can be inspected
+    with trap_report.py. '''
+    def __init__(self, path, restart, budget=1000, min_pages=100,
+                 min_novelty=0.05):
+        self.logger = get_logger("TRAPS", "FRONTIER")
+        self.path = path
+        self.budget = budget
+        self.min_pages = min_pages
+        self.min_novelty = min_novelty
+        # template -> [urls added, pages crawled, new urls they added,
+        #              reason it was cut off or None]
+        self.templates = dict()
+        self.lock = Lock()
+        if restart and os.path.exists(path):
+            os.remove(path)
+        if os.path.exists(path):
+            with open(path) as state:
+                self.templates = json.load(state)
+
+    def _cut_off(self, template, stats, reason):
+        stats[3] = reason
+        self.logger.info(f"Cut off url template {template}: {reason}.")
+
+    def admit(self, url):
+        ''' Counts a newly discovered url against its template. False when
+        the url must not be crawled. '''
+        if has_repeated_segments(url):
+            return False
+        template = url_template(url)
+        with self.lock:
+            stats = self.templates.get(template)
+            if stats is None:
+                stats = self.templates[template] = [0, 0, 0, None]
+            if stats[3] is not None:
+                return False
+            if self.budget and stats[0] >= self.budget:
+                self._cut_off(
+                    template, stats, f"more than {self.budget} urls")
+                return False
+            stats[0] += 1
+            return True
+
+    def allowed(self, url):
+        ''' False when the url's template was cut off since it was added. '''
+        stats = self.templates.get(url_template(url))
+        return stats is None or stats[3] is None
+
+    def record_page(self, url, new_urls):
+        ''' Counts a crawled page of the url's template and the number of new
+        urls it added to the frontier. '''
+        template = url_template(url)
+        with self.lock:
+            stats = self.templates.get(template)
+            if stats is None:
+                # A seed, or a url added before the state was kept.
+                stats = self.templates[template] = [1, 0, 0, None]
+            stats[1] += 1
+            stats[2] += new_urls
+            if (stats[3] is None and self.min_pages
+                    and stats[1] >= self.min_pages
+                    and stats[2] < self.min_novelty * stats[1]):
+                self._cut_off(
+                    template, stats,
+                    f"{stats[1]} pages added only {stats[2]} new urls")
+
+    def report(self, count=20):
+        ''' The count largest templates and every template cut off, as
+        (template, urls added, pages crawled, new urls, reason). '''
+        with self.lock:
+            rows = [
+                (template, *stats) for template, stats
+                in self.templates.items()]
+        rows.sort(key=lambda row: row[1], reverse=True)
+        return (
+            rows[:count],
+            [row for row in rows if row[4] is not None])
+
+    def dump(self):
+        with self.lock:
+            with open(f"{self.path}.tmp", "w") as state:
+                json.dump(self.templates, state)
+            os.replace(f"{self.path}.tmp", self.path)
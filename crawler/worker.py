@@ -1,17 +1,86 @@
+import time
+
+from collections import Counter
 from threading import Thread
+from urllib.parse import urljoin
 
 from inspect import getsource
 from utils.download import download
-from utils import get_logger
+from utils import get_logger, get_host
+from crawler.analytics import counted_words
+from crawler.simhash import simhash, MIN_WORDS
 import scraper
-import time
+
+
+def summarize(tokens):
+    ''' What the crawl keeps of the words of a page: (fingerprint, words,
+    length), its SimHash or None below MIN_WORDS words, the Counter of its
+    counted_words and its number of words. None for no page. Much smaller
+    than the words, so parser processes send this back instead. '''
+    if tokens is None:
+        return None
+    fingerprint = simhash(tokens) if len(tokens) >= MIN_WORDS else None
+    return fingerprint, Counter(counted_words(tokens)), len(tokens)
+
+
+def scrape_page(url, resp):
+    ''' scraper.scrape_page with the words summarized: (links, summary,
+    canonical). '''
+    links, tokens, canonical = scraper.scrape_page(url, resp)
+    return links, summarize(tokens), canonical
+
+
+class PagePipeline(object):
+    ''' Everything done with a downloaded page before its links are added:
+    archiving, the duplicate checks, scraping and the analytics.
+
+    scrape parses the page once, see scrape_page, or in the parser processes
+    with ParsePool.scrape_page. archive, analytics and recorder,
+    which keeps the cache server's responses for replay_server.py, are None
+    when launch.py did not start them. '''
+    def __init__(
+            self, scrape=None, archive=None, analytics=None, recorder=None):
+        self.scrape = scrape if scrape is not None else scrape_page
+        self.archive = archive
+        self.analytics = analytics
+        self.recorder = recorder
+
+    def links(self, config, frontier, logger, url, resp):
+        ''' Returns the links of the page to add, none for a duplicate. '''
+        original = frontier.find_same_content(url, resp)
+        if self.archive is not None:
+            self.archive.write(url, resp, original is not None)
+        if original is not None:
+            if self.analytics is not None:
+                self.analytics.record(url, None)
+            logger.info(f"Not parsing {url}, same content as {original}.")
+            return []
+        links, summary, canonical = self.scrape(url, resp)
+        if canonical and config.canonical_links:
+            canonical = urljoin(resp.url or url, canonical)
+            if frontier.add_canonical(url, canonical):
+                logger.info(
+                    f"Not downloading {canonical}, the canonical url of "
+                    f"{url}.")
+        if summary is None:
+            return links
+        fingerprint, words, length = summary
+        if self.analytics is not None:
+            self.analytics.record(url, words, length)
+        if frontier.is_near_duplicate(url, fingerprint):
+            logger.info(
+                f"Not following links of {url}, near duplicate of a page "
+                f"already crawled.")
+            return []
+        return links
 
 
 class Worker(Thread):
-    def __init__(self, worker_id, config, frontier):
+    def __init__(self, worker_id, config, frontier, pipeline=None):
         self.logger = get_logger(f"Worker-{worker_id}", "Worker")
         self.config = config
         self.frontier = frontier
+        self.pipeline = pipeline if pipeline is not None else PagePipeline()
         # basic check for requests in scraper
         assert {getsource(scraper).find(req) for req in {"from requests import", "import requests"}} == {-1}, "Do not use requests in scraper.py"
         assert {getsource(scraper).find(req) for req in {"from urllib.request import", "import urllib.request"}} == {-1}, "Do not use urllib.request in scraper.py"
@@ -23,12 +92,37 @@ class Worker(Thread):
             if not tbd_url:
                 self.logger.info("Frontier is empty. Stopping Crawler.")
                 break
-            resp = download(tbd_url, self.config, self.logger)
+            scraped_urls = None
+            try:
+                scraped_urls = self._process(tbd_url)
+            except Exception:
+                # The url still has to be marked complete, otherwise the
+                # frontier keeps counting it as in flight and never ends.
+                self.logger.exception(f"Failed to process {tbd_url}.")
+            # The page's links and its completion are saved together.
+            new_urls = self.frontier.complete_and_add(
+                tbd_url, scraped_urls or ())
+            if scraped_urls is not None:
+                self.frontier.traps.record_page(tbd_url, new_urls)
+
+    def _process(self, tbd_url):
+        ''' Fetches and scrapes tbd_url. Returns its links, or None when it
+        was skipped. '''
+        robots = self.frontier.robots
+        if robots.fetch(tbd_url, self.pipeline.recorder):
+            # The robots.txt request used up the host's politeness window.
+            time.sleep(robots.delay(get_host(tbd_url)))
+        if not robots.allowed(tbd_url):
+            self.logger.info(f"Skipped {tbd_url}, disallowed by robots.txt.")
+            return None
+        if not self.frontier.traps.allowed(tbd_url):
             self.logger.info(
-                f"Downloaded {tbd_url}, status <{resp.status}>, "
-                f"using cache {self.config.cache_server}.")
-            scraped_urls = scraper.scraper(tbd_url, resp)
-            for scraped_url in scraped_urls:
-                self.frontier.add_url(scraped_url)
-            self.frontier.mark_url_complete(tbd_url)
-            time.sleep(self.config.time_delay)
+                f"Skipped {tbd_url}, its url template was cut off.")
+            return None
+        resp = download(
+            tbd_url, self.config, self.logger, self.pipeline.recorder)
+        self.logger.info(
+            f"Downloaded {tbd_url}, status <{resp.status}>, "
+            f"using cache {self.config.cache_server}.")
+        return self.pipeline.links(
+            self.config, self.frontier, self.logger, tbd_url, resp)
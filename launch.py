@@ -6,22 +6,98 @@ from argparse import ArgumentParser
 
 from utils.server_registration import get_cache_server
 from utils.config import Config
+from utils.cache_replay import Recorder
 from crawler import Crawler
+from crawler.async_crawler import AsyncCrawler
+from crawler.frontier import Frontier, LogFrontier
+from crawler.worker import PagePipeline
+from crawler.parse_pool import ParsePool
+from crawler.analytics import CrawlAnalytics
+from crawler.archive import ArchiveWriter
+from crawler.shard import Coordinator, shard_path
+import scraper
 
 
-def main(config_file, restart):
+def main(config_file, restart, engine, cache_server, record):
     cparser = ConfigParser()
     cparser.read(config_file)
     config = Config(cparser)
-    config.cache_server = get_cache_server(config, restart)
+    if cache_server:
+        # A local stand-in such as replay_server.py; skip registration.
+        host, port = cache_server.rsplit(":", 1)
+        config.cache_server = (host, int(port))
+    else:
+        config.cache_server = get_cache_server(config, restart)
+    scraper.PARSER = config.parser
+    if config.shards > 1:
+        # One crawl process per shard of the hosts, each with its own files.
+        def run_shard(shard_config, shard, restart):
+            shard_record = shard_path(record, shard.index) if record else None
+            crawl(shard_config, restart, engine, shard_record, shard)
+        coordinator = Coordinator(config, run_shard)
+        coordinator.run(restart)
+        coordinator.write_report()
+    else:
+        crawl(config, restart, engine, record)
+
+
+def crawl(config, restart, engine, record, shard=None):
+    frontier_class = LogFrontier if config.store == "log" else Frontier
+    # The analytics and the archive describe the pages of the save file;
+    # without one they start over along with the frontier.
+    restart = restart or not frontier_class.save_file_exists(config)
+    recorder = Recorder(record) if record else None
+    analytics = CrawlAnalytics(
+        config.analytics_file, restart, config.analytics_every)
+    archive = None
+    if config.archive_dir:
+        archive = ArchiveWriter(
+            config.archive_dir, restart, config.archive_segment_size)
+    parse_pool = None
+    if config.parse_processes:
+        # Before the crawler starts any thread, so the fork is safe.
+        parse_pool = ParsePool(config)
+    pipeline = PagePipeline(
+        parse_pool.scrape_page if parse_pool is not None else None,
+        archive, analytics, recorder)
     
-    crawler = Crawler(config, restart)
-    crawler.start()
+    def frontier_factory(config, restart):
+        return frontier_class(config, restart, shard)
+    crawler_factory = AsyncCrawler if engine == "async" else Crawler
+    try:
+        crawler = crawler_factory(
+            config, restart, frontier_factory=frontier_factory,
+            pipeline=pipeline)
+        if archive is not None:
+            # The pages of a checkpoint are in the archive too.
+            crawler.frontier.checkpoint_hooks.append(archive.sync)
+        if shard is not None:
+            shard.start(crawler.frontier)
+        crawler.start()
+        analytics.write_report(config.report_file)
+    finally:
+        # Also on Ctrl-C, so what was crawled so far is saved.
+        analytics.close()
+        if archive is not None:
+            archive.close()
+        if parse_pool is not None:
+            parse_pool.close()
+        if recorder is not None:
+            recorder.close()
 
 
 if __name__ == "__main__":
     parser = ArgumentParser()
     parser.add_argument("--restart", action="store_true", default=False)
     parser.add_argument("--config_file", type=str, default="config.ini")
+    parser.add_argument(
+        "--engine", choices=["threads", "async"], default="threads")
+    parser.add_argument(
+        "--cache_server", type=str, default=None,
+        help="host:port of a cache server to use without registering.")
+    parser.add_argument(
+        "--record", type=str, default=None,
+        help="Append every cache server response to this recording.")
     args = parser.parse_args()
-    main(args.config_file, args.restart)
+    main(args.config_file, args.restart, args.engine, args.cache_server,
+         args.record)
@@ -0,0 +1,34 @@
+from argparse import ArgumentParser
+
+from utils.cache_replay import CacheReplayServer, read_recording
+
+
+def main(recording, host, port, latency, jitter, error_rate):
+    responses = read_recording(recording)
+    server = CacheReplayServer(
+        (host, port), responses, latency, jitter, error_rate)
+    print(f"Replaying {len(responses)} responses from {recording} on "
+          f"{host}:{server.server_port}.")
+    print(f"Run the crawler with --cache_server {host}:{server.server_port}")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser(
+        description="Serve a recording made with launch.py --record in place "
+                    "of the cache server.")
+    parser.add_argument("recording", type=str)
+    parser.add_argument("--host", type=str, default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9000)
+    parser.add_argument(
+        "--latency", type=float, default=0,
+        help="Seconds added to every response.")
+    parser.add_argument(
+        "--jitter", type=float, default=0,
+        help="Up to this many more seconds added at random.")
+    parser.add_argument(
+        "--error_rate", type=float, default=0,
+        help="Fraction of requests answered with an empty HTTP 502.")
+    args = parser.parse_args()
+    main(args.recording, args.host, args.port, args.latency, args.jitter,
+         args.error_rate)
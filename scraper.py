@@ -1,10 +1,32 @@
-import re
-from urllib.parse import urljoin, urldefrag, urlparse
+from urllib.parse import urljoin, urldefrag
 from bs4 import BeautifulSoup
 
+from utils.url_filter import UrlFilter
+from utils.text import parse_page, text_tokens, _collect
+
+# How extract_next_links finds the hrefs of a page:
+#   "lxml": stream lxml parser events, keeping only <a> and <base> tags.
+#   "bs4": build a full BeautifulSoup tree and search it.
+# Both give the same links; launch.py sets it from PARSER in config.ini.
+PARSER = "lxml"
+
 def scraper(url, resp):
     links = extract_next_links(url, resp)
-    return [link for link in links if is_valid(link)]
+    return filter_urls(links)
+
+def scrape_page(url, resp):
+    # What the crawler calls: scraper(url, resp), plus the words of the
+    # page's visible text and its <link rel="canonical"> href, all from one
+    # parse of the page. Returns (links, tokens, canonical); tokens and
+    # canonical are None when resp is not an html page.
+    page = parse_page(resp)
+    if page is None:
+        return scraper(url, resp), None, None
+    if PARSER == "bs4":
+        links = extract_next_links(url, resp)
+    else:
+        links = resolve_links(resp.url or url, page.hrefs, page.base_href)
+    return filter_urls(links), text_tokens(page), page.canonical
 
 def extract_next_links(url, resp):
     # Implementation required.
@@ -34,14 +56,22 @@ def extract_next_links(url, resp):
     if not html:
         return []
 
-    # using beautiful soup to parse and find href:
-    # https://stackoverflow.com/questions/5815747/beautifulsoup-getting-href
-    base_url = resp.url or url
-    soup = BeautifulSoup(html, "lxml")
+    if PARSER == "bs4":
+        hrefs, base_href = extract_hrefs_bs4(html)
+    else:
+        hrefs, base_href = extract_hrefs_lxml(html, content_type)
+
+    return resolve_links(resp.url or url, hrefs, base_href)
+
+
+def resolve_links(base_url, hrefs, base_href):
+    # absolute, defragmented links of the hrefs of the page at base_url
+    if base_href and base_href.strip():
+        # relative links resolve against <base href> when the page has one
+        base_url = urljoin(base_url, base_href.strip())
 
     links = []
-    for a in soup.find_all("a", href=True):
-        href = a.get("href")
+    for href in hrefs:
         #get rid of all href starting with
         if not href:
             continue
@@ -59,72 +89,66 @@ def extract_next_links(url, resp):
     return links
 
 
-ILLEGAL_EXTENSIONS = re.compile(
-    r".*\.(css|js|bmp|gif|jpe?g|ico|png|tiff?|svg|webp|"
-    r"mid|mp2|mp3|mp4|wav|avi|mov|mpeg|ram|m4v|mkv|ogg|ogv|webm|"
-    r"wmv|flv|"
-    r"pdf|ps|eps|tex|ppt|pptx|pps|ppsx|doc|docx|xls|xlsx|"
-    r"zip|rar|gz|tgz|bz2|7z|tar|"
-    r"exe|msi|bin|dmg|iso|dll|"
-    r"csv|tsv|arff|rtf|jar|war)$",
-    re.IGNORECASE,
+def extract_hrefs_bs4(html):
+    # using beautiful soup to parse and find href:
+    # https://stackoverflow.com/questions/5815747/beautifulsoup-getting-href
+    soup = BeautifulSoup(html, "lxml")
+    base = soup.find("base", href=True)
+    hrefs = [a.get("href") for a in soup.find_all("a", href=True)]
+    return hrefs, base.get("href") if base else None
+
+
+def extract_hrefs_lxml(html, content_type=""):
+    # stream lxml parser events through the same collector as parse_page,
+    # never building a tree (see utils/text.py)
+    page = _collect(html, content_type)
+    return page.hrefs, page.base_href
+
+
+# is_valid rules, compiled once into URL_FILTER (see utils/url_filter.py)
+ALLOWED_HOSTS = {
+    "ics.uci.edu",
+    "cs.uci.edu",
+    "informatics.uci.edu",
+    "stat.uci.edu",
+}
+
+# spec #1: filter non-web pages by extension
+ILLEGAL_EXTENSIONS = {
+    "css", "js", "bmp", "gif", "jpg", "jpeg", "ico", "png", "tif", "tiff",
+    "svg", "webp",
+    "mid", "mp2", "mp3", "mp4", "wav", "avi", "mov", "mpeg", "ram", "m4v",
+    "mkv", "ogg", "ogv", "webm",
+    "wmv", "flv",
+    "pdf", "ps", "eps", "tex", "ppt", "pptx", "pps", "ppsx", "doc", "docx",
+    "xls", "xlsx",
+    "zip", "rar", "gz", "tgz", "bz2", "7z", "tar",
+    "exe", "msi", "bin", "dmg", "iso", "dll",
+    "csv", "tsv", "arff", "rtf", "jar", "war",
+}
+
+# extra: avoid obvious traps
+TRAP_TOKENS = (
+    "/calendar/", "/events/", "/wp-json/", "/cgi-bin/",
+    ";jsessionid=", "sessionid", "phpsessid",
+)
+
+URL_FILTER = UrlFilter(
+    ALLOWED_HOSTS,
+    illegal_extensions=ILLEGAL_EXTENSIONS,
+    trap_tokens=TRAP_TOKENS,
+    max_path_length=300,
+    max_path_depth=10,
 )
 
 def is_valid(url):
     # Decide whether to crawl this url or not.
     # If you decide to crawl it, return True; otherwise return False.
-    # There are already some conditions that return False.
-    try:
-        if not url or not isinstance(url, str):
-            return False
-
-        p = urlparse(url)
-
-        if p.scheme not in ("http", "https"):
-            return False
-
-        if p.query:
-            return False
-
-        host = (p.hostname or "").lower().rstrip(".")
-        if host.startswith("www."):
-            host = host[4:]
-
-        ALLOWED_HOSTS = {
-            "ics.uci.edu",
-            "cs.uci.edu",
-            "informatics.uci.edu",
-            "stat.uci.edu",
-        }
-
-        if host not in ALLOWED_HOSTS:
-            return False
-
-        # spec #1: filter non-web pages by extension
-        path = (p.path or "").lower()
-        if ILLEGAL_EXTENSIONS.match(path):
-            return False
-
-        # robots.txt disallowed prefixes
-        DISALLOWED_PREFIXES = ("/people", "/happening")
-        if any(path == pref or path.startswith(pref + "/") for pref in DISALLOWED_PREFIXES):
-            return False
-
-        # extra: avoid obvious traps
-        if len(path) > 300:
-            return False
-        if path.count("/") > 10:
-            return False
-        if any(tok in path for tok in ("/calendar/", "/events/", "/wp-json/", "/cgi-bin/")):
-            return False
-        if any(tok in path for tok in (";jsessionid=", "sessionid", "phpsessid")):
-            return False
-
-        return True
-
-    except Exception:
-        return False
-
-
-
-
+    # No query strings, only the allowed hosts, no illegal extensions or
+    # trap paths; see URL_FILTER above. robots.txt rules are applied by the
+    # frontier (crawler/robots.py).
+    return URL_FILTER.is_valid(url)
+
+def filter_urls(urls):
+    # is_valid for a whole page of links at once
+    return URL_FILTER.filter_urls(urls)
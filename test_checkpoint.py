@@ -0,0 +1,48 @@
+import time
+
+from utils import get_urlhash
+from crawler.frontier import LogFrontier
+from benchmarks.frontier_batch import make_config
+
+
+def pending_hashes(frontier):
+    while frontier.loading:
+        time.sleep(0.01)
+    return {
+        get_urlhash(url) for queue in frontier.to_be_downloaded.values()
+        for _, url, _, _ in queue}
+
+
+def crawl(frontier, pages):
+    ''' Completes pages urls, each with one new link. '''
+    done = set()
+    for _ in range(pages):
+        url = frontier.get_tbd_url()
+        frontier.complete_and_add(url, [f"{url}/child"])
+        done.add(get_urlhash(url))
+    return done
+
+
+def test_resume_from_checkpoint_and_the_log_after_it(tmp_path):
+    config = make_config(str(tmp_path), "log")
+    config.time_delay = 0
+    config.seed_urls = ["https://www.ics.uci.edu/"]
+    frontier = LogFrontier(config, True)
+    frontier.add_urls(f"https://www.ics.uci.edu/page/{i}" for i in range(20))
+    done = crawl(frontier, 5)
+    frontier.checkpoint()
+    # Only in the log from here on.
+    done |= crawl(frontier, 3)
+    in_flight = get_urlhash(frontier.get_tbd_url())
+    seen_count = len(frontier.seen)
+    # A crash right after a group commit: the frontier is not closed.
+    frontier.save.sync()
+    frontier.robots.close()
+
+    resumed = LogFrontier(config, False)
+    pending = pending_hashes(resumed)
+    assert len(resumed.seen) == seen_count
+    assert in_flight in pending
+    assert not pending & done
+    assert len(pending) == seen_count - len(done)
+    resumed.close()
@@ -0,0 +1,91 @@
+from requests.models import Response as RawResponse
+
+import crawler.robots
+from utils.response import Response
+from crawler.robots import RobotsRules, Robots
+from benchmarks.frontier_batch import make_config
+
+ROBOTS_TXT = """
+User-agent: *
+Disallow: /private
+Allow: /private/open
+Disallow: /*.pdf$
+Disallow: /search*?q=
+Crawl-delay: 2
+
+User-agent: otherbot
+Disallow: /
+"""
+
+
+def test_longest_match_wins_and_allow_wins_a_tie():
+    rules = RobotsRules([
+        (False, "/a"), (True, "/a/b"), (False, "/a/b/c"),
+        (True, "/x"), (False, "/x")])
+    assert rules.allowed("/")
+    assert not rules.allowed("/a")
+    assert not rules.allowed("/about")
+    assert rules.allowed("/a/b/index.html")
+    assert not rules.allowed("/a/b/c")
+    assert rules.allowed("/x/y")
+
+
+def test_wildcards_and_end_anchors():
+    rules = RobotsRules.parse(ROBOTS_TXT, "IR UW26 crawler")
+    assert not rules.allowed("/papers/thesis.pdf")
+    assert rules.allowed("/papers/thesis.pdf?page=2")
+    assert not rules.allowed("/search/all?q=uci")
+    assert rules.allowed("/search/all?page=2")
+    assert not rules.allowed("/private/notes")
+    assert rules.allowed("/private/open/notes")
+    assert rules.crawl_delay == 2
+
+
+def test_groups_are_matched_by_user_agent():
+    rules = RobotsRules.parse(ROBOTS_TXT, "OtherBot 1.0")
+    assert not rules.allowed("/index.html")
+    assert rules.crawl_delay is None
+    assert RobotsRules.parse("", "OtherBot").allowed("/anything")
+
+
+def robots_response(url, status, text):
+    raw_response = RawResponse()
+    raw_response.status_code = status
+    raw_response._content = text.encode("utf-8")
+    resp = Response({"url": url, "status": status})
+    resp.raw_response = raw_response
+    return resp
+
+
+def test_fetch_once_per_host_and_cache(tmp_path, monkeypatch):
+    fetched = list()
+
+    def download(url, config, logger=None, recorder=None):
+        fetched.append(url)
+        if url.startswith("https://www.ics.uci.edu/"):
+            return robots_response(url, 200, ROBOTS_TXT)
+        return robots_response(url, 404, "")
+    monkeypatch.setattr(crawler.robots, "download", download)
+    config = make_config(str(tmp_path), "log")
+    config.time_delay = 0.5
+    robots = Robots(config)
+    # Hosts not fetched yet are let through for the worker to check.
+    assert robots.allowed("https://www.ics.uci.edu/private/x")
+    assert robots.fetch("https://www.ics.uci.edu/private/x")
+    assert not robots.fetch("https://www.ics.uci.edu/other")
+    assert robots.fetch("https://www.cs.uci.edu/private/x")
+    assert fetched == [
+        "https://www.ics.uci.edu/robots.txt",
+        "https://www.cs.uci.edu/robots.txt"]
+    assert not robots.allowed("https://www.ics.uci.edu/private/x")
+    assert robots.allowed("https://www.cs.uci.edu/private/x")
+    assert robots.delay("www.ics.uci.edu") == 2
+    assert robots.delay("www.cs.uci.edu") == 0.5
+    robots.close()
+
+    # A resumed crawl reads them from the cache.
+    robots = Robots(config)
+    assert not robots.fetch("https://www.ics.uci.edu/")
+    assert not robots.allowed("https://www.ics.uci.edu/private/x")
+    assert len(fetched) == 2
+    robots.close()
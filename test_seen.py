@@ -0,0 +1,35 @@
+import random
+
+from crawler.seen import FingerprintSet
+
+
+def test_add_and_contains_across_growth():
+    rng = random.Random(5)
+    fingerprints = [rng.getrandbits(64) for _ in range(5000)]
+    seen = FingerprintSet(capacity=16)
+    assert all(seen.add(fingerprint) for fingerprint in fingerprints)
+    assert not any(seen.add(fingerprint) for fingerprint in fingerprints)
+    assert len(seen) == len(set(fingerprints))
+    assert all(fingerprint in seen for fingerprint in fingerprints)
+    assert rng.getrandbits(64) not in seen
+    assert set(seen) == set(fingerprints)
+
+
+def test_zero_is_a_fingerprint_too():
+    seen = FingerprintSet()
+    assert 0 not in seen
+    assert seen.add(0)
+    assert 0 in seen and len(seen) == 1
+
+
+def test_dump_and_load():
+    seen = FingerprintSet()
+    for fingerprint in range(1, 100):
+        seen.add(fingerprint * 7919)
+    slots, count = seen.dump()
+    loaded = FingerprintSet()
+    loaded.load(slots, count)
+    assert len(loaded) == 99 and set(loaded) == set(seen)
+    # The dump is a copy.
+    seen.add(1)
+    assert 1 not in loaded
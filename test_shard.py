@@ -0,0 +1,47 @@
+from utils import get_urlhash
+from crawler.shard import shard_of, shard_path, shard_config
+from benchmarks.frontier_batch import make_config
+
+# Urls of one page: the same url key, whatever their scheme, "www.", port,
+# escapes, parameter order or fragment.
+ALIASES = [
+    ["https://www.ics.uci.edu/~eppstein/",
+     "http://ics.uci.edu/%7Eeppstein/",
+     "https://WWW.ICS.UCI.EDU:443/~eppstein/#top"],
+    ["https://www.cs.uci.edu/a?x=1&y=2",
+     "http://cs.uci.edu:80/a?y=2&x=1"],
+    ["http://vision.ics.uci.edu:8080/p",
+     "http://www.vision.ics.uci.edu:8080/p"],
+]
+
+
+def test_one_url_key_maps_to_one_shard():
+    for urls in ALIASES:
+        assert len({get_urlhash(url) for url in urls}) == 1
+        for count in range(2, 8):
+            assert len({shard_of(url, count) for url in urls}) == 1
+
+
+def test_hosts_spread_over_the_shards():
+    hosts = [f"https://host{i}.ics.uci.edu/" for i in range(200)]
+    for count in (2, 3, 4):
+        shards = [shard_of(url, count) for url in hosts]
+        assert set(shards) == set(range(count))
+        # Stable, unlike hash().
+        assert shards == [shard_of(url, count) for url in hosts]
+
+
+def test_shard_config(tmp_path):
+    config = make_config(str(tmp_path), "log")
+    config.archive_dir = str(tmp_path / "archive")
+    config.seed_urls = [
+        "https://www.ics.uci.edu", "https://www.cs.uci.edu",
+        "https://www.informatics.uci.edu", "https://www.stat.uci.edu"]
+    shards = [shard_config(config, index, 3) for index in range(3)]
+    assert sorted(url for shard in shards for url in shard.seed_urls) == (
+        sorted(config.seed_urls))
+    for index, shard in enumerate(shards):
+        assert all(shard_of(url, 3) == index for url in shard.seed_urls)
+        assert shard.save_file == shard_path(config.save_file, index)
+        assert shard.archive_dir == str(tmp_path / f"archive-{index}")
+    assert shard_path("frontier.log", 2) == "frontier-2.log"
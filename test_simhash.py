@@ -0,0 +1,56 @@
+import random
+
+import pytest
+
+from crawler.simhash import SimHashIndex, simhash, hamming
+
+
+def flip(fingerprint, bits):
+    for bit in bits:
+        fingerprint ^= 1 << bit
+    return fingerprint
+
+
+def test_every_fingerprint_within_distance_is_found():
+    rng = random.Random(7)
+    index = SimHashIndex(distance=3, bucket_bits=8)
+    stored = [rng.getrandbits(64) for _ in range(500)]
+    for key, fingerprint in enumerate(stored):
+        index.add(fingerprint, key)
+    for fingerprint in stored[:100]:
+        near = flip(fingerprint, rng.sample(range(64), 3))
+        assert hamming(index.find(near, -1), near) <= 3
+
+
+def test_a_page_never_matches_itself():
+    index = SimHashIndex(distance=3)
+    assert index.check_and_add(12345, 1) is None
+    assert index.check_and_add(12345, 1) is None
+    assert index.check_and_add(flip(12345, [60]), 2) == 12345
+
+
+def test_near_duplicate_pages_get_near_fingerprints():
+    rng = random.Random(3)
+    words = [f"word{rng.randrange(2000)}" for _ in range(400)]
+    edited = list(words)
+    edited[200] = "changed"
+    other = [f"word{rng.randrange(2000)}" for _ in range(400)]
+    assert hamming(simhash(words), simhash(edited)) <= 3
+    assert hamming(simhash(words), simhash(other)) > 3
+
+
+def test_dump_and_load(tmp_path):
+    path = str(tmp_path / "frontier.simhash")
+    index = SimHashIndex(distance=2, bucket_bits=6)
+    for key in range(50):
+        index.add(key * 0x9E3779B97F4A7C15 & (1 << 64) - 1, key)
+    index.dump(path)
+    loaded = SimHashIndex.load(path)
+    assert loaded.distance == 2 and len(loaded) == 50
+    assert loaded.keys == index.keys
+    assert loaded.find(index.fingerprints[7], -1) == index.fingerprints[7]
+    assert loaded.find(index.fingerprints[7], 7) is None
+    with open(path, "ab") as dump:
+        dump.write(b"\0")
+    with pytest.raises(ValueError):
+        SimHashIndex.load(path)
@@ -0,0 +1,99 @@
+import time
+
+from threading import Lock
+
+from crawler.spill import SpillQueue
+from crawler.frontier import LogFrontier
+from benchmarks.frontier_batch import make_config
+
+
+def make_urls(count):
+    return [(i % 4, f"https://www.ics.uci.edu/page/{i}") for i in range(count)]
+
+
+def pop_all(spill, lock):
+    entries = list()
+    while len(spill):
+        if spill.needs_io():
+            spill.io(lock)
+        with lock:
+            entries.extend(spill.pop(len(spill)))
+    return entries
+
+
+def test_urls_come_back_in_order(tmp_path):
+    lock = Lock()
+    spill = SpillQueue(str(tmp_path / "spill"), 3)
+    urls = make_urls(10)
+    with lock:
+        for depth, url in urls:
+            spill.append(depth, url)
+    assert len(spill) == 10
+    spill.io(lock)
+    assert pop_all(spill, lock) == urls
+
+
+def test_resume_keeps_the_checkpoint_range(tmp_path):
+    lock = Lock()
+    directory = str(tmp_path / "spill")
+    spill = SpillQueue(directory, 3)
+    urls = make_urls(10)
+    with lock:
+        for depth, url in urls[:7]:
+            spill.append(depth, url)
+        head_urls = spill.pop(2)
+        # Urls of a loaded segment not popped yet go into the checkpoint.
+        pending = spill.prepare(100)
+    spill.io(lock)
+    spill.write_state()
+    spill.commit()
+    with lock:
+        # Spilled after the checkpoint: replayed from the log, not resumed.
+        for depth, url in urls[7:]:
+            spill.append(depth, url)
+    spill.io(lock)
+
+    resumed = SpillQueue(directory, 3)
+    assert resumed.resume(100)
+    assert head_urls + pending + list(resumed.drain()) == urls[:7]
+    assert len(resumed) == 7 - len(head_urls) - len(pending)
+    assert pop_all(resumed, lock) == urls[2 + len(pending):7]
+
+
+def test_resume_without_a_matching_checkpoint_is_empty(tmp_path):
+    lock = Lock()
+    directory = str(tmp_path / "spill")
+    spill = SpillQueue(directory, 3)
+    with lock:
+        for depth, url in make_urls(5):
+            spill.append(depth, url)
+        spill.prepare(100)
+    spill.io(lock)
+    spill.write_state()
+    spill.commit()
+    resumed = SpillQueue(directory, 3)
+    assert not resumed.resume(200)
+    assert len(resumed) == 0 and list(resumed.drain()) == []
+
+
+def test_frontier_resumes_spilled_urls_without_spilling(tmp_path):
+    config = make_config(str(tmp_path), "log")
+    config.queue_memory = 8
+    frontier = LogFrontier(config, True)
+    urls = [f"https://www.ics.uci.edu/page/{i}" for i in range(100)]
+    frontier.add_urls(urls)
+    assert len(frontier.spill) > 0
+    frontier.close()
+
+    config.queue_memory = 0
+    frontier = LogFrontier(config, False)
+    while frontier.loading:
+        time.sleep(0.01)
+    pending = {
+        url for queue in frontier.to_be_downloaded.values()
+        for _, url, _, _ in queue}
+    # Nothing was completed: every url seen is pending.
+    assert set(urls) <= pending and len(pending) == len(frontier.seen)
+    frontier.close()
+    # Once a checkpoint holds them, the spill is gone.
+    assert not (tmp_path / "frontier-log.spill").exists()
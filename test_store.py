@@ -0,0 +1,107 @@
+import os
+
+from array import array
+
+from utils import get_urlhash
+from crawler.store import LogStore
+
+
+def make_records(count, completed=False):
+    urls = [f"https://www.ics.uci.edu/page/{i}" for i in range(count)]
+    return [(get_urlhash(url), url, completed, i % 3)
+            for i, url in enumerate(urls)]
+
+
+def write_log(path, records):
+    store = LogStore(path)
+    store.put_many(records)
+    store.close()
+
+
+def test_records_replay_in_order(tmp_path):
+    path = str(tmp_path / "frontier.log")
+    added = make_records(5)
+    completed = make_records(2, completed=True)
+    write_log(path, added + completed)
+    store = LogStore(path)
+    assert list(store.records()) == added + completed
+    store.close()
+
+
+def test_torn_tail_is_dropped_and_appended_over(tmp_path):
+    path = str(tmp_path / "frontier.log")
+    records = make_records(4)
+    write_log(path, records)
+    # A crash in the middle of the last record.
+    with open(path, "r+b") as save:
+        save.truncate(os.path.getsize(path) - 3)
+    store = LogStore(path)
+    assert list(store.records()) == records[:3]
+    extra = make_records(6)[5:]
+    store.put_many(extra)
+    store.close()
+    store = LogStore(path)
+    assert list(store.records()) == records[:3] + extra
+    store.close()
+
+
+def test_corrupt_record_ends_the_replay(tmp_path):
+    path = str(tmp_path / "frontier.log")
+    records = make_records(3)
+    write_log(path, records[:1])
+    first_size = os.path.getsize(path)
+    write_log(path, records[1:])
+    with open(path, "r+b") as save:
+        save.seek(first_size + 10)
+        byte = save.read(1)
+        save.seek(first_size + 10)
+        save.write(bytes([byte[0] ^ 0xFF]))
+    store = LogStore(path)
+    assert list(store.records()) == records[:1]
+    store.close()
+
+
+def test_records_after_checkpoint_offset(tmp_path):
+    path = str(tmp_path / "frontier.log")
+    records = make_records(4)
+    store = LogStore(path)
+    store.put_many(records[:2])
+    store.sync()
+    offset = store.tell()
+    slots = array("Q", [0, 7, 0, 9])
+    store.write_checkpoint(offset, slots, 2, [(0, records[0][1]), (2, "x y")])
+    store.put_many(records[2:])
+    store.close()
+    store = LogStore(path)
+    checkpoint_offset, loaded, seen_count, pending = store.read_checkpoint()
+    assert checkpoint_offset == offset
+    assert loaded == slots and seen_count == 2
+    assert list(pending) == [(0, records[0][1]), (2, "x y")]
+    assert list(store.records(offset)) == records[2:]
+    store.close()
+
+
+def test_checkpoint_ahead_of_the_log_is_ignored(tmp_path):
+    path = str(tmp_path / "frontier.log")
+    store = LogStore(path)
+    store.put_many(make_records(2))
+    store.sync()
+    store.write_checkpoint(store.tell() + 100, array("Q", [0]), 0, [])
+    store.close()
+    store = LogStore(path)
+    assert store.read_checkpoint() is None
+    store.close()
+
+
+def test_checkpoint_without_its_log_is_removed(tmp_path):
+    path = str(tmp_path / "frontier.log")
+    store = LogStore(path)
+    store.put_many(make_records(2))
+    store.sync()
+    store.write_checkpoint(store.tell(), array("Q", [0]), 0, [])
+    store.close()
+    LogStore.remove(path)
+    store = LogStore(path)
+    assert store.read_checkpoint() is None
+    assert not os.path.exists(f"{path}.checkpoint")
+    store.close()
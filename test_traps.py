@@ -0,0 +1,60 @@
+from crawler.traps import url_template, has_repeated_segments, TrapDetector
+
+
+def test_repeated_segments():
+    assert has_repeated_segments("https://www.ics.uci.edu/news/news/x")
+    assert has_repeated_segments("https://www.ics.uci.edu/a/b/a/b/a/")
+    assert not has_repeated_segments("https://www.ics.uci.edu/a/b/a/c")
+    assert not has_repeated_segments("https://www.ics.uci.edu/")
+
+
+def test_dates_are_not_repeated_segments():
+    assert not has_repeated_segments(
+        "https://www.ics.uci.edu/2021/01/01/post")
+    assert not has_repeated_segments(
+        "https://www.ics.uci.edu/events/2019/12/12/12/")
+
+
+def test_url_template():
+    assert (url_template("https://WWW.ics.uci.edu/events/2021-01-05?day=3")
+            == url_template("https://www.ics.uci.edu/events/2022-11-30?day=9"))
+    assert (url_template("https://www.ics.uci.edu/s/0123456789abcdef01/p")
+            == "www.ics.uci.edu/s/{id}/p")
+    assert (url_template("https://www.ics.uci.edu/a?b=1&a=2")
+            == "www.ics.uci.edu/a?a&b")
+
+
+def test_budget_cuts_a_template_off(tmp_path):
+    traps = TrapDetector(str(tmp_path / "traps"), True, budget=3)
+    urls = [f"https://www.ics.uci.edu/calendar/{day}" for day in range(5)]
+    assert [traps.admit(url) for url in urls] == [
+        True, True, True, False, False]
+    assert not traps.allowed(urls[0])
+    assert traps.allowed("https://www.ics.uci.edu/about")
+
+
+def test_low_novelty_cuts_a_template_off(tmp_path):
+    traps = TrapDetector(
+        str(tmp_path / "traps"), True, budget=0, min_pages=4,
+        min_novelty=0.5)
+    urls = [f"https://www.ics.uci.edu/page/{i}" for i in range(4)]
+    for url in urls:
+        assert traps.admit(url)
+    for url in urls[:3]:
+        traps.record_page(url, 0)
+    assert traps.allowed(urls[3])
+    traps.record_page(urls[3], 1)
+    assert not traps.allowed(urls[3])
+    assert not traps.admit("https://www.ics.uci.edu/page/9")
+
+
+def test_state_is_kept_unless_restarted(tmp_path):
+    path = str(tmp_path / "traps")
+    traps = TrapDetector(path, True, budget=1)
+    traps.admit("https://www.ics.uci.edu/p/1")
+    traps.admit("https://www.ics.uci.edu/p/2")
+    traps.dump()
+    assert not TrapDetector(path, False, budget=1).allowed(
+        "https://www.ics.uci.edu/p/3")
+    assert TrapDetector(path, True, budget=1).allowed(
+        "https://www.ics.uci.edu/p/3")
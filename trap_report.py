@@ -0,0 +1,29 @@
+from configparser import ConfigParser
+from argparse import ArgumentParser
+
+from crawler.traps import TrapDetector
+
+
+def main(config_file, save_file, count):
+    if not save_file:
+        cparser = ConfigParser()
+        cparser.read(config_file)
+        save_file = cparser["LOCAL PROPERTIES"]["SAVE"]
+    largest, cut_off = TrapDetector(f"{save_file}.traps", False).report(count)
+    print(f"{'urls':>8} {'pages':>8} {'new urls':>8}  template")
+    for template, added, crawled, new_urls, _ in largest:
+        print(f"{added:>8} {crawled:>8} {new_urls:>8}  {template}")
+    print(f"\n{len(cut_off)} templates cut off:")
+    for template, _, _, _, reason in cut_off:
+        print(f"  {template}: {reason}")
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser(
+        description="Show the url templates of the crawl with the most urls "
+                    "and the ones cut off as traps.")
+    parser.add_argument("--config_file", type=str, default="config.ini")
+    parser.add_argument("--save_file", type=str, default=None)
+    parser.add_argument("--count", type=int, default=20)
+    args = parser.parse_args()
+    main(args.config_file, args.save_file, args.count)
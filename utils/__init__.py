@@ -3,6 +3,8 @@ import logging
 from hashlib import sha256
 from urllib.parse import urlparse
 
+from utils.canonical import canonicalize
+
 def get_logger(name, filename=None):
     logger = logging.getLogger(name)
     logger.setLevel(logging.INFO)
@@ -23,13 +25,22 @@ def get_logger(name, filename=None):
 
 
 def get_urlhash(url):
-    parsed = urlparse(url)
-    # everything other than scheme.
-    return sha256(
-        f"{parsed.netloc}/{parsed.path}/{parsed.params}/"
-        f"{parsed.query}/{parsed.fragment}".encode("utf-8")).hexdigest()
+    # Urls with the same canonical key are the same page, whatever their
+    # scheme, "www.", port, escapes or parameter order (utils/canonical.py).
+    return sha256(canonicalize(url)[1].encode("utf-8")).hexdigest()
+
+def get_fingerprint(urlhash):
+    # The first 64 bits of the url hash, used as a compact in-memory key.
+    return int(urlhash[:16], 16)
+
+def get_host(url):
+    return (urlparse(url).hostname or "").lower()
+
+def get_key_host(url):
+    # The host in the url's key, without "www." and with a non-default port:
+    # every url of a page has the same one.
+    return urlparse(canonicalize(url)[1]).netloc.rpartition("@")[2]
 
 def normalize(url):
-    if url.endswith("/"):
-        return url.rstrip("/")
-    return url
+    # Shares the memoized parse with get_urlhash.
+    return canonicalize(url)[0]
@@ -0,0 +1,118 @@
+import asyncio
+import cbor
+
+from urllib.parse import urlencode
+
+from utils.response import Response
+
+
+class AsyncDownloader(object):
+    ''' asyncio counterpart of utils.download.download.
+
+    A minimal HTTP/1.1 client for the cache server's GET /?q=&u= endpoint
+    that keeps idle connections open for reuse, so hundreds of requests can
+    be in flight from one thread. Responses are decoded exactly as download
+    does. recorder, if any, keeps the responses as download's does. '''
+    def __init__(self, config, logger, recorder=None):
+        self.config = config
+        self.logger = logger
+        self.recorder = recorder
+        self.idle = list()
+
+    async def download(self, url):
+        query = urlencode([("q", url), ("u", self.config.user_agent)])
+        try:
+            status, content = await asyncio.wait_for(
+                self._get(f"/?{query}"), self.config.read_timeout)
+            if self.recorder is not None:
+                self.recorder.record(url, status, content)
+        except (OSError, ValueError, asyncio.TimeoutError,
+                asyncio.IncompleteReadError) as e:
+            # Timeouts and connection errors have no status from the server.
+            self.logger.error(
+                f"Cache server request error {e!r} with url {url}.")
+            return Response({
+                "error": f"Cache server request error {e!r} with url {url}.",
+                "status": 0,
+                "url": url})
+        try:
+            if status < 400 and content:
+                return Response(cbor.loads(content))
+        except (EOFError, ValueError):
+            pass
+        self.logger.error(
+            f"Spacetime Response error <Response [{status}]> with url {url}.")
+        return Response({
+            "error": (
+                f"Spacetime Response error <Response [{status}]> "
+                f"with url {url}."),
+            "status": status,
+            "url": url})
+
+    async def _get(self, target):
+        if self.idle:
+            connection = self.idle.pop()
+            try:
+                return await self._request(connection, target)
+            except (ConnectionError, asyncio.IncompleteReadError):
+                # The server closed the idle connection; retry on a new one.
+                pass
+        host, port = self.config.cache_server
+        connection = await asyncio.wait_for(
+            asyncio.open_connection(host, port), self.config.connect_timeout)
+        return await self._request(connection, target)
+
+    async def _request(self, connection, target):
+        reader, writer = connection
+        host, port = self.config.cache_server
+        try:
+            writer.write(
+                f"GET {target} HTTP/1.1\r\nHost: {host}:{port}\r\n"
+                f"Connection: keep-alive\r\n\r\n".encode("latin-1"))
+            await writer.drain()
+            status_line = await reader.readline()
+            if not status_line:
+                raise ConnectionResetError("Connection closed by server.")
+            version, status = status_line.split(None, 2)[:2]
+            headers = dict()
+            while True:
+                line = await reader.readline()
+                if line in (b"\r\n", b"\n", b""):
+                    break
+                name, _, value = line.decode("latin-1").partition(":")
+                headers[name.strip().lower()] = value.strip().lower()
+            if headers.get("transfer-encoding") == "chunked":
+                content = await self._read_chunked(reader)
+            elif "content-length" in headers:
+                content = await reader.readexactly(
+                    int(headers["content-length"]))
+            else:
+                content = await reader.read()
+                headers["connection"] = "close"
+        except BaseException:
+            writer.close()
+            raise
+        keep_alive = headers.get("connection") != "close" and (
+            version == b"HTTP/1.1" or headers.get("connection") == "keep-alive")
+        if keep_alive:
+            self.idle.append(connection)
+        else:
+            writer.close()
+        return int(status), content
+
+    async def _read_chunked(self, reader):
+        chunks = list()
+        while True:
+            size = int((await reader.readline()).split(b";")[0], 16)
+            if not size:
+                # Skip trailers up to the blank line.
+                while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+                    pass
+                return b"".join(chunks)
+            chunks.append(await reader.readexactly(size))
+            await reader.readexactly(2)
+
+    async def close(self):
+        for _, writer in self.idle:
+            writer.close()
+        self.idle = list()
@@ -0,0 +1,100 @@
+import time
+import random
+import struct
+import cbor
+
+from threading import Lock
+from urllib.parse import urlparse, parse_qs
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+# A recording is a sequence of records, each this header followed by the
+# utf-8 url and the response body exactly as the cache server sent it:
+#   http status | url length | body length
+RECORD_HEADER = struct.Struct("<HII")
+
+
+class Recorder(object):
+    ''' Appends every cache server response the crawler receives to a
+    recording that CacheReplayServer can serve later. '''
+    def __init__(self, path):
+        self.file = open(path, "ab")
+        self.lock = Lock()
+
+    def record(self, url, status, content):
+        url = url.encode("utf-8")
+        content = content or b""
+        record = RECORD_HEADER.pack(status, len(url), len(content))
+        with self.lock:
+            self.file.write(record + url + content)
+            self.file.flush()
+
+    def close(self):
+        with self.lock:
+            self.file.close()
+
+
+def read_recording(path):
+    ''' Returns {url: (status, body)}; the last response of a url wins. '''
+    responses = dict()
+    with open(path, "rb") as recording:
+        while True:
+            header = recording.read(RECORD_HEADER.size)
+            if len(header) < RECORD_HEADER.size:
+                return responses
+            status, url_length, body_length = RECORD_HEADER.unpack(header)
+            url = recording.read(url_length)
+            body = recording.read(body_length)
+            if len(body) < body_length:
+                # Torn last record of an interrupted crawl.
+                return responses
+            responses[url.decode("utf-8")] = (status, body)
+
+
+class CacheReplayServer(ThreadingHTTPServer):
+    ''' Local stand-in for the spacetime cache server.
+
+    Serves recorded responses on the same GET /?q=<url>&u=<agent> endpoint
+    with the same cbor body, so utils.download and utils.response work
+    unchanged. Urls that were not recorded get a cbor 404 without a page.
+    latency (plus up to jitter) seconds is added to every response, and
+    error_rate of the responses are replaced by an empty HTTP 502. '''
+    daemon_threads = True
+
+    def __init__(self, address, responses, latency=0, jitter=0,
+                 error_rate=0):
+        super().__init__(address, CacheReplayHandler)
+        self.responses = responses
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+
+
+class CacheReplayHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        server = self.server
+        query = parse_qs(urlparse(self.path).query)
+        url = query.get("q", [""])[0]
+        delay = server.latency + random.random() * server.jitter
+        if delay:
+            time.sleep(delay)
+        if random.random() < server.error_rate:
+            self._send(502, b"")
+            return
+        if url in server.responses:
+            status, body = server.responses[url]
+        else:
+            status, body = 200, cbor.dumps({
+                "url": url, "status": 404,
+                "error": f"{url} is not in the recording."})
+        self._send(status, body)
+
+    def _send(self, status, body):
+        self.send_response(status)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
@@ -0,0 +1,82 @@
+import re
+import string
+
+from functools import lru_cache
+from urllib.parse import urlsplit, urlunsplit
+
+DEFAULT_PORTS = {"http": 80, "https": 443}
+# Characters that mean the same escaped or not (RFC 3986 2.3).
+UNRESERVED = frozenset(string.ascii_letters + string.digits + "-._~")
+ESCAPE = re.compile(r"%([0-9a-fA-F]{2})")
+# Urls canonicalized per process. A crawl asks for the same urls over and
+# over: every page links to the same menus, and the frontier, the analytics
+# and the archive all hash the urls they are given.
+CACHE_SIZE = 1 << 16
+
+
+def _unescape(match):
+    char = chr(int(match.group(1), 16))
+    return char if char in UNRESERVED else f"%{match.group(1).upper()}"
+
+
+def normalize_escapes(text):
+    ''' Unescapes unreserved characters and uppercases the other escapes. '''
+    if "%" not in text:
+        return text
+    return ESCAPE.sub(_unescape, text)
+
+
+def remove_dot_segments(path):
+    ''' /a/./b/../c -> /a/c, as a browser resolves it. '''
+    if "/." not in path or not path.startswith("/"):
+        return path
+    segments = path.split("/")
+    resolved = list()
+    for segment in segments[1:]:
+        if segment == "..":
+            if resolved:
+                resolved.pop()
+        elif segment != ".":
+            resolved.append(segment)
+    if segments[-1] in (".", ".."):
+        # /a/b/.. is the directory /a/.
+        resolved.append("")
+    return "/" + "/".join(resolved)
+
+
+def sort_query(query):
+    ''' The parameters sorted by name; repeated names keep their order. '''
+    params = [normalize_escapes(param) for param in query.split("&") if param]
+    return "&".join(sorted(params, key=lambda param: param.split("=", 1)[0]))
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def canonicalize(url):
+    ''' (canonical url, key) for url.
+
+    The canonical url has a lowercase scheme and host, no default port,
+    no fragment, the dot segments of its path resolved, its escapes
+    normalized, its query parameters sorted and no trailing slash. The key
+    identifies the page: the canonical url without its scheme and without a
+    leading "www." on the host. Urls that cannot be parsed are their own
+    canonical url and key. '''
+    try:
+        parts = urlsplit(url.strip())
+        port = parts.port
+    except ValueError:
+        return url, url
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").rstrip(".")
+    if ":" in host:
+        host = f"[{host}]"
+    if port is not None and port != DEFAULT_PORTS.get(scheme):
+        host = f"{host}:{port}"
+    userinfo = parts.netloc.rpartition("@")[0]
+    path = remove_dot_segments(normalize_escapes(parts.path)).rstrip("/")
+    query = sort_query(parts.query) if parts.query else ""
+    netloc = f"{userinfo}@{host}" if userinfo else host
+    canonical = urlunsplit((scheme, netloc, path, query, ""))
+    if host.startswith("www.") and "." in host[4:]:
+        host = host[4:]
+        netloc = f"{userinfo}@{host}" if userinfo else host
+    return canonical, urlunsplit(("", netloc, path, query, ""))
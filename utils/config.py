@@ -8,12 +8,59 @@ class Config(object):
         assert self.user_agent != "DEFAULT AGENT", "Set useragent in config.ini"
         assert re.match(r"^[a-zA-Z0-9_ ,]+$", self.user_agent), "User agent should not have any special characters outside '_', ',' and 'space'"
         self.threads_count = int(config["LOCAL PROPERTIES"]["THREADCOUNT"])
+        self.parse_processes = int(
+            config["LOCAL PROPERTIES"].get("PARSEPROCESSES", "0"))
+        self.async_requests = int(
+            config["LOCAL PROPERTIES"].get("ASYNCREQUESTS", "100"))
         self.save_file = config["LOCAL PROPERTIES"]["SAVE"]
+        self.store = config["LOCAL PROPERTIES"].get("STORE", "shelve")
+        self.commit_batch = int(
+            config["LOCAL PROPERTIES"].get("COMMITBATCH", "512"))
+        self.commit_interval = float(
+            config["LOCAL PROPERTIES"].get("COMMITINTERVAL", "0.2"))
+        self.checkpoint_every = int(
+            config["LOCAL PROPERTIES"].get("CHECKPOINTEVERY", "5000"))
+        self.resume_chunk = int(
+            config["LOCAL PROPERTIES"].get("RESUMECHUNK", "10000"))
+        self.queue_memory = int(
+            config["LOCAL PROPERTIES"].get("QUEUEMEMORY", "1000000"))
+        self.analytics_file = config["LOCAL PROPERTIES"].get(
+            "ANALYTICS", "analytics.log")
+        self.analytics_every = int(
+            config["LOCAL PROPERTIES"].get("ANALYTICSEVERY", "1000"))
+        self.report_file = config["LOCAL PROPERTIES"].get(
+            "REPORT", "report.txt")
+        self.shards = int(config["LOCAL PROPERTIES"].get("SHARDS", "1"))
+        self.shard_batch = int(
+            config["LOCAL PROPERTIES"].get("SHARDBATCH", "256"))
+        self.archive_dir = config["LOCAL PROPERTIES"].get("ARCHIVE", "")
+        self.archive_segment_size = int(
+            config["LOCAL PROPERTIES"].get("ARCHIVESEGMENT", "268435456"))
 
         self.host = config["CONNECTION"]["HOST"]
         self.port = int(config["CONNECTION"]["PORT"])
+        self.connect_timeout = float(
+            config["CONNECTION"].get("CONNECTTIMEOUT", "5"))
+        self.read_timeout = float(config["CONNECTION"].get("READTIMEOUT", "30"))
+        # 0 means one pooled connection per worker thread.
+        self.pool_size = (
+            int(config["CONNECTION"].get("POOLSIZE", "0"))
+            or self.threads_count)
 
         self.seed_urls = config["CRAWLER"]["SEEDURL"].split(",")
         self.time_delay = float(config["CRAWLER"]["POLITENESS"])
+        self.parser = config["CRAWLER"].get("PARSER", "lxml")
+        self.robots_file = config["CRAWLER"].get("ROBOTSCACHE", "robots.shelve")
+        self.robots_ttl = float(config["CRAWLER"].get("ROBOTSTTL", "86400"))
+        self.near_duplicate_distance = int(
+            config["CRAWLER"].get("NEARDUPDISTANCE", "3"))
+        self.queue_policy = config["CRAWLER"].get("QUEUEPOLICY", "bfs")
+        self.canonical_links = config["CRAWLER"].getboolean(
+            "CANONICALLINKS", True)
+        self.trap_budget = int(config["CRAWLER"].get("TRAPBUDGET", "1000"))
+        self.trap_min_pages = int(
+            config["CRAWLER"].get("TRAPMINPAGES", "100"))
+        self.trap_min_novelty = float(
+            config["CRAWLER"].get("TRAPMINNOVELTY", "0.05"))
 
         self.cache_server = None
\ No newline at end of file
@@ -2,13 +2,47 @@ import requests
 import cbor
 import time
 
+from threading import Lock
+from requests.adapters import HTTPAdapter
+
 from utils.response import Response
 
-def download(url, config, logger=None):
+# One session shared by all workers, so connections to the cache server are
+# kept alive and reused instead of opened for every url.
+_session = None
+_session_lock = Lock()
+
+def get_session(config):
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                session = requests.Session()
+                # Every worker can hold a connection; more workers than
+                # connections wait for one instead of opening extra sockets.
+                adapter = HTTPAdapter(
+                    pool_connections=1, pool_maxsize=config.pool_size,
+                    pool_block=True)
+                session.mount("http://", adapter)
+                _session = session
+    return _session
+
+def download(url, config, logger=None, recorder=None):
     host, port = config.cache_server
-    resp = requests.get(
-        f"http://{host}:{port}/",
-        params=[("q", f"{url}"), ("u", f"{config.user_agent}")])
+    try:
+        resp = get_session(config).get(
+            f"http://{host}:{port}/",
+            params=[("q", f"{url}"), ("u", f"{config.user_agent}")],
+            timeout=(config.connect_timeout, config.read_timeout))
+        if recorder is not None:
+            recorder.record(url, resp.status_code, resp.content)
+    except requests.RequestException as e:
+        # Timeouts and connection errors have no status from the server.
+        logger.error(f"Cache server request error {e!r} with url {url}.")
+        return Response({
+            "error": f"Cache server request error {e!r} with url {url}.",
+            "status": 0,
+            "url": url})
     try:
         if resp and resp.content:
             return Response(cbor.loads(resp.content))
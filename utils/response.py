@@ -1,14 +1,31 @@
 import pickle
 
 class Response(object):
+    # url, status and error come from the cache server's cbor envelope and
+    # are read directly. The pickled requests.Response is kept as the bytes
+    # cbor produced and only unpickled when raw_response is first read, so
+    # error responses, which the scraper rejects by status, never are.
+    __slots__ = ("url", "status", "error", "_payload", "_raw_response")
+
     def __init__(self, resp_dict):
         self.url = resp_dict["url"]
         self.status = resp_dict["status"]
         self.error = resp_dict["error"] if "error" in resp_dict else None
-        try:
-            self.raw_response = (
-                pickle.loads(resp_dict["response"])
-                if "response" in resp_dict else
-                None)
-        except TypeError:
-            self.raw_response = None
+        self._payload = (
+            resp_dict["response"] if "response" in resp_dict else None)
+        self._raw_response = None
+
+    @property
+    def raw_response(self):
+        if self._payload is not None:
+            try:
+                self._raw_response = pickle.loads(self._payload)
+            except TypeError:
+                self._raw_response = None
+            self._payload = None
+        return self._raw_response
+
+    @raw_response.setter
+    def raw_response(self, raw_response):
+        self._payload = None
+        self._raw_response = raw_response
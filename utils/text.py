@@ -0,0 +1,97 @@
+import re
+
+from lxml import etree
+
+CHARSET = re.compile(r"charset=[\"']?([\w.:-]+)")
+# Words are runs of ascii letters and digits, lowercased.
+TOKEN = re.compile(r"[a-z0-9]+")
+# Elements whose text is never shown.
+HIDDEN_TAGS = {"script", "style", "noscript", "template", "head", "title"}
+
+
+class _PageCollector(object):
+    # lxml parser target: keeps the text outside of hidden elements, the
+    # <a href>s, and the hrefs of the first <base> and the first
+    # <link rel="canonical">, so one pass over a page gives all of them
+    def __init__(self):
+        self.chunks = []
+        self.hidden = 0
+        self.hrefs = []
+        self.base_href = None
+        self.canonical = None
+
+    def start(self, tag, attrib):
+        if tag == "a":
+            href = attrib.get("href")
+            if href is not None:
+                self.hrefs.append(href)
+        elif tag in HIDDEN_TAGS:
+            self.hidden += 1
+        elif tag == "base" and self.base_href is None:
+            self.base_href = attrib.get("href")
+        elif (tag == "link" and self.canonical is None
+                and "canonical" in attrib.get("rel", "").lower().split()):
+            self.canonical = attrib.get("href")
+
+    def end(self, tag):
+        if tag in HIDDEN_TAGS and self.hidden:
+            self.hidden -= 1
+
+    def data(self, data):
+        if not self.hidden:
+            self.chunks.append(data)
+
+    def close(self):
+        return self
+
+
+def _collect(html, content_type):
+    # decode with the Content-Type charset if there is one, otherwise lxml
+    # sniffs it from the page's <meta> like BeautifulSoup does
+    match = CHARSET.search(content_type)
+    collector = _PageCollector()
+    try:
+        parser = etree.HTMLParser(
+            target=collector, encoding=match.group(1) if match else None)
+    except LookupError:
+        parser = etree.HTMLParser(target=collector)
+    try:
+        parser.feed(html)
+        parser.close()
+    except etree.Error:
+        # keep whatever was collected before the parser gave up
+        pass
+    return collector
+
+
+def visible_text(html, content_type=""):
+    ''' The text a browser would show for the page, in one string. '''
+    return " ".join(_collect(html, content_type).chunks)
+
+
+def tokenize(text):
+    return TOKEN.findall(text.lower())
+
+
+def parse_page(resp):
+    ''' One pass over a downloaded html page: its hrefs, base_href,
+    canonical and visible text chunks, see text_tokens(). None when resp is not
+    an html page. '''
+    if resp is None or resp.status != 200 or resp.raw_response is None:
+        return None
+    content_type = resp.raw_response.headers.get("Content-Type", "").lower()
+    if "text/html" not in content_type or not resp.raw_response.content:
+        return None
+    return _collect(resp.raw_response.content, content_type)
+
+
+def text_tokens(page):
+    ''' Words of the visible text of a parse_page result. '''
+    return tokenize(" ".join(page.chunks))
+
+
+def page_tokens(resp):
+    ''' Words of the visible text of a downloaded html page, or None when
+    resp is not one. '''
+    page = parse_page(resp)
+    return text_tokens(page) if page is not None else None
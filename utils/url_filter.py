@@ -0,0 +1,112 @@
+from functools import lru_cache
+from urllib.parse import urlparse
+
+
+class PrefixTrie(object):
+    ''' Path prefixes matched on whole segments: the prefix "/people"
+    matches "/people" and "/people/x" but not "/peoples". A lookup walks
+    one trie node per segment of the path. '''
+    def __init__(self, prefixes):
+        self.root = dict()
+        self.depth = 0
+        for prefix in prefixes:
+            segments = prefix.strip("/").split("/")
+            self.depth = max(self.depth, len(segments))
+            node = self.root
+            for segment in segments:
+                node = node.setdefault(segment, dict())
+            # An empty key marks the end of a prefix.
+            node[""] = True
+
+    def matches(self, segments):
+        node = self.root
+        for segment in segments:
+            node = node.get(segment)
+            if node is None:
+                return False
+            if "" in node:
+                return True
+        return False
+
+
+class UrlFilter(object):
+    ''' The url rules of scraper.is_valid, compiled once.
+
+    A url is valid when its scheme is allowed, it has no query, its host
+    (lowercased, without a trailing dot or one leading "www.") is allowed,
+    its lowercased path does not start with a disallowed prefix, does not
+    end in an illegal extension, is at most max_path_length long and
+    max_path_depth deep, and contains none of the trap tokens.
+
+    Decisions are memoized twice: per url, since navigation links repeat on
+    every page, and per (netloc, leading path segments), which is all the
+    host and prefix rules depend on. '''
+    def __init__(self, allowed_hosts, disallowed_prefixes=(),
+                 illegal_extensions=(), trap_tokens=(),
+                 max_path_length=300, max_path_depth=10,
+                 schemes=("http", "https"), cache_size=1 << 16):
+        self.allowed_hosts = frozenset(allowed_hosts)
+        self.prefixes = PrefixTrie(disallowed_prefixes)
+        self.illegal_extensions = frozenset(illegal_extensions)
+        # A token that contains another token can never decide anything.
+        self.trap_tokens = tuple(
+            token for token in trap_tokens
+            if not any(
+                other != token and other in token for other in trap_tokens))
+        self.max_path_length = max_path_length
+        self.max_path_depth = max_path_depth
+        self.schemes = frozenset(schemes)
+        self._is_valid = lru_cache(maxsize=cache_size)(self._decide)
+        self._host_and_prefix_allowed = lru_cache(maxsize=cache_size)(
+            self._decide_host_and_prefix)
+
+    def is_valid(self, url):
+        if not url or not isinstance(url, str):
+            return False
+        return self._is_valid(url)
+
+    def filter_urls(self, urls):
+        ''' The valid urls among urls, in order. '''
+        is_valid = self._is_valid
+        return [
+            url for url in urls
+            if url and isinstance(url, str) and is_valid(url)]
+
+    def _decide(self, url):
+        try:
+            return self._check(url)
+        except Exception:
+            return False
+
+    def _check(self, url):
+        parsed = urlparse(url)
+        if parsed.scheme not in self.schemes or parsed.query:
+            return False
+        path = parsed.path.lower()
+        if (len(path) > self.max_path_length
+                or path.count("/") > self.max_path_depth):
+            return False
+        if "." in path and (
+                path.rpartition(".")[2] in self.illegal_extensions):
+            return False
+        for token in self.trap_tokens:
+            if token in path:
+                return False
+        depth = self.prefixes.depth
+        leading = tuple(path.split("/", depth + 1)[1:depth + 1])
+        return self._host_and_prefix_allowed(parsed.netloc, leading)
+
+    def _decide_host_and_prefix(self, netloc, leading_segments):
+        host = (urlparse(f"//{netloc}").hostname or "").lower().rstrip(".")
+        if host.startswith("www."):
+            host = host[4:]
+        if host not in self.allowed_hosts:
+            return False
+        return not self.prefixes.matches(leading_segments)
+
+    def cache_info(self):
+        return self._is_valid.cache_info()
+
+    def cache_clear(self):
+        self._is_valid.cache_clear()
+        self._host_and_prefix_allowed.cache_clear()